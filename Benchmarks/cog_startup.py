@@ -0,0 +1,167 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Measure how long loading the covid cog's modules takes, and the RSS after it,
+on top of what discord.py itself costs. Each measurement is done in a fresh
+interpreter, so that nothing is already imported.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.cog_startup [--importtime]
+                                                        [--max-ms MS]
+                                                        [--max-rss-mib MIB]
+
+With --importtime, the slowest imports (from `python -X importtime`) of the
+cog are listed. If the cog's own load time or RSS goes above the given
+limits, the exit status is 1, so that it can be used to catch regressions.
+"""
+
+
+# Import standard library dependencies
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# What the bot has already imported before loading the cog
+BASELINE_IMPORTS = ["discord", "discord.ext.commands"]
+
+COG_IMPORTS = [
+    "Cogs.Utility.Covid.covid",
+    "Cogs.Utility.Covid.covid_slash",
+]
+
+# Dependencies which should be loaded only on first refresh
+HEAVY_MODULES = ["pandas", "numpy", "aiofiles", "pendulum"]
+
+RUNS = 5
+
+
+# Code run in the fresh interpreter; prints a json with the measurements
+PROBE = """
+import json, resource, sys, time
+for module in {baseline!r}:
+    __import__(module)
+start = time.perf_counter()
+for module in {imports!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "rss_kib": rss,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(imports: list[str]) -> dict:
+    """Import modules in a fresh interpreter and get the measurements."""
+
+    code = PROBE.format(baseline=BASELINE_IMPORTS, imports=imports,
+                        heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True).stdout
+
+    return json.loads(output)
+# End of probe()
+
+
+def slowest_imports(count: int = 15) -> list[tuple[int, str]]:
+    """Get the imports taking most (cumulative) time while loading the cog."""
+
+    code = ";".join(f"import {module}" for module in BASELINE_IMPORTS)
+    code += ";import importlib"
+    code += "".join(f";importlib.import_module({module!r})"
+                    for module in COG_IMPORTS)
+
+    # The baseline is imported too, but those entries are printed before the
+    # cog's, so only the part after the last baseline entry is looked at
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            check=True, capture_output=True,
+                            text=True).stderr
+
+    lines = stderr.splitlines()
+    start = max(i for i, line in enumerate(lines)
+                if line.rstrip().endswith("| discord.ext.commands")) + 1
+
+    imports = []
+    for line in lines[start:]:
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        imports.append((int(cumulative), module.rstrip()))
+
+    return sorted(imports, reverse=True)[:count]
+# End of slowest_imports()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--importtime", action="store_true",
+                        help="list the slowest imports of the cog")
+    parser.add_argument("--max-ms", type=float,
+                        help="fail if loading the cog takes longer")
+    parser.add_argument("--max-rss-mib", type=float,
+                        help="fail if loading the cog adds more RSS")
+    args = parser.parse_args()
+
+    baseline = [probe([]) for _ in range(RUNS)]
+    cog = [probe(COG_IMPORTS) for _ in range(RUNS)]
+
+    load_ms = statistics.median(run["ms"] for run in cog)
+    baseline_rss = statistics.median(run["rss_kib"] for run in baseline)
+    cog_rss = statistics.median(run["rss_kib"] for run in cog)
+    added_rss_mib = (cog_rss - baseline_rss) / 1024
+
+    print(f"Cog load time (median of {RUNS}): {load_ms:.1f} ms")
+    print(f"RSS with discord.py only: {baseline_rss / 1024:.1f} MiB")
+    print(f"RSS after loading cog: {cog_rss / 1024:.1f} MiB "
+          f"(+{added_rss_mib:.1f} MiB)")
+    print("Heavy modules loaded by the cog: "
+          + (", ".join(cog[0]["loaded"]) or "none"))
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative us):")
+        for cumulative, module in slowest_imports():
+            print(f"{cumulative:>10}  {module}")
+
+    failed = False
+    if args.max_ms is not None and load_ms > args.max_ms:
+        print(f"\nLoad time is above {args.max_ms} ms!")
+        failed = True
+    if args.max_rss_mib is not None and added_rss_mib > args.max_rss_mib:
+        print(f"\nAdded RSS is above {args.max_rss_mib} MiB!")
+        failed = True
+
+    return 1 if failed else 0
+# End of main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+# End of file
@@ -0,0 +1,384 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Differential harness for the formatters. Runs an alternative ("candidate")
+engine side by side with the current ("reference") one, on fixtures for the
+known edge cases and on randomized synthetic feeds, and reports every field
+which differs along with a paired timing comparison.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.equivalence [--candidate MODULE]
+        [--random N] [--seed S] [--repeat N] [--show N]
+
+MODULE is an importable module having an ENGINE dict, mapping names of the
+formatters in REFERENCE_ENGINE to the functions replacing them (with the same
+signatures). Formatters it doesn't replace are skipped. Without a candidate,
+the reference is compared with itself, which should find no differences.
+The exit status is 1 if any difference was found.
+"""
+
+
+# Import standard library dependencies
+import argparse
+import asyncio
+import csv
+from datetime import date, datetime, timedelta
+import importlib
+from io import StringIO
+import inspect
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+# Import the reference formatters
+from ..Format.district import format_district_stats
+from ..Format.json_decode import decode_data_json, extract_state_json
+from ..Format.records import Record
+from ..Format.state import format_state_stats
+from ..Format.tests import format_test_stats
+from ..Format.timeseries_statewise import format_state_timeseries
+from ..Format.vaccination import format_vaccination_stats
+from .feeds import synthetic_feeds
+
+
+REFERENCE_ENGINE = {
+    "format_state_stats": format_state_stats,
+    "format_district_stats": format_district_stats,
+    "format_test_stats": format_test_stats,
+    "format_vaccination_stats": format_vaccination_stats,
+    "format_state_timeseries": format_state_timeseries,
+}
+
+# How each formatter is called with a case's feeds
+CALLS = {
+    "format_state_stats": lambda f, feeds: f(
+        text(feeds["state"]),
+        extract_state_json(decode_data_json(feeds["state_json"]))
+    ),
+    "format_district_stats": lambda f, feeds: f(text(feeds["district"])),
+    "format_test_stats": lambda f, feeds: f(text(feeds["tests"]),
+                                            text(feeds["icmr"])),
+    "format_vaccination_stats": lambda f, feeds: f(text(feeds["vaccination"])),
+    "format_state_timeseries": lambda f, feeds: f(
+        statistics_csv=text(feeds["tests"]), date_field="Updated On",
+        statistic_required="Total Tested", source_field="Source1"
+    ),
+}
+
+
+def text(body: bytes) -> StringIO:
+    return StringIO(body.decode())
+
+
+# Editing feeds for the edge cases
+
+def edit_json(body: bytes, edit: Callable[[dict], None]) -> bytes:
+    data = json.loads(body)
+    edit(data)
+    return json.dumps(data).encode()
+
+
+def edit_csv(body: bytes, edit: Callable[[list[dict]], list[dict]]) -> bytes:
+    reader = csv.DictReader(StringIO(body.decode()))
+    rows = edit(list(reader))
+
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=reader.fieldnames,
+                            lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+    return buffer.getvalue().encode()
+
+
+def set_state_dates(feeds: dict[str, bytes], days_ago: int,
+                    hour: int) -> None:
+    """Make the json's date days_ago days back, last updated today at hour."""
+
+    data_date = (date.today() - timedelta(days=days_ago)).isoformat()
+    last_updated = datetime.combine(date.today(), datetime.min.time())
+    last_updated = last_updated.replace(hour=hour).isoformat() + "+05:30"
+
+    def edit(data: dict) -> None:
+        for state_data in data.values():
+            state_data["meta"]["date"] = data_date
+            state_data["meta"]["last_updated"] = last_updated
+
+    feeds["state_json"] = edit_json(feeds["state_json"], edit)
+
+
+def fixture_cases() -> dict[str, dict[str, bytes]]:
+    """Feeds for the edge cases the formatters are known to have."""
+
+    cases = {"baseline": synthetic_feeds()}
+
+    # State code missing in json, so csv data is used for it
+    feeds = synthetic_feeds()
+    feeds["state_json"] = edit_json(
+        feeds["state_json"], lambda data: [data.pop(code) for code in
+                                           ("KL", "TN", "DL")]
+    )
+    cases["json_missing_states"] = feeds
+
+    # 9 AM rule of parsed_json_stats(): previous day's deltas are shown only
+    # till 9 AM, and never for older dates
+    for name, days_ago, hour in [("previous_day_before_9am", 1, 8),
+                                 ("previous_day_after_9am", 1, 10),
+                                 ("older_date", 3, 8)]:
+        feeds = synthetic_feeds()
+        set_state_dates(feeds, days_ago, hour)
+        cases[name] = feeds
+
+    # Latest rows without a value, and rows before them (the "previous" ones)
+    # without values
+    def blank_latest(rows: list[dict]) -> list[dict]:
+        latest = {}
+        for row in rows:
+            latest[row["State"]] = row
+        for index, row in enumerate(latest.values()):
+            field = ("Total Tested" if "Total Tested" in row
+                     else "Total Doses Administered")
+            row[field] = ""
+            if index % 2 == 0:  # Blank previous row too for half the states
+                previous = [r for r in rows if r["State"] == row["State"]]
+                previous[-2][field] = ""
+        return rows
+
+    feeds = synthetic_feeds()
+    feeds["tests"] = edit_csv(feeds["tests"], blank_latest)
+    feeds["vaccination"] = edit_csv(feeds["vaccination"], blank_latest)
+    cases["blank_latest_and_previous"] = feeds
+
+    # A state having just one row (so there's no previous row at all)
+    feeds = synthetic_feeds()
+    for name in ("tests", "vaccination"):
+        feeds[name] = edit_csv(feeds[name], lambda rows: [
+            row for row in rows if row["State"] != "Goa"
+        ] + [next(row for row in rows if row["State"] == "Goa")])
+    cases["single_row_state"] = feeds
+
+    # Same district name in several states (more than the usual ones)
+    feeds = synthetic_feeds()
+    feeds["district"] = edit_csv(feeds["district"], lambda rows: [
+        {**row, "District": "Common"} if index % 50 == 0 else row
+        for index, row in enumerate(rows)
+    ])
+    cases["duplicate_district_names"] = feeds
+
+    return cases
+# End of fixture_cases()
+
+
+def random_cases(count: int, seed: int) -> dict[str, dict[str, bytes]]:
+    """Synthetic feeds with random edge cases mixed in."""
+
+    rng = random.Random(seed)
+    cases = {}
+
+    for index in range(count):
+        feeds = synthetic_feeds(seed=rng.randrange(10 ** 6),
+                                day=rng.randrange(30),
+                                history=rng.randrange(2, 200))
+
+        if rng.random() < 0.5:
+            set_state_dates(feeds, rng.choice([0, 1, 1, 2]),
+                            rng.randrange(24))
+
+        if rng.random() < 0.5:
+            dropped = rng.sample(range(30), rng.randrange(1, 5))
+            feeds["state_json"] = edit_json(
+                feeds["state_json"],
+                lambda data: [data.pop(code) for i, code in
+                              enumerate(list(data)) if i in dropped]
+            )
+
+        # Blank out random cells, like missing reports
+        for name, field in [("tests", "Total Tested"),
+                            ("vaccination", "Total Doses Administered")]:
+            share = rng.choice([0, 0.05, 0.3])
+            feeds[name] = edit_csv(feeds[name], lambda rows: [
+                {**row, field: ""} if rng.random() < share else row
+                for row in rows
+            ])
+
+        cases[f"random_{index}"] = feeds
+
+    return cases
+# End of random_cases()
+
+
+# Running and comparing
+
+def normalize(value: Any) -> Any:
+    """Turn records, numpy scalars, NaN etc. into plain comparable values."""
+
+    if isinstance(value, Record):
+        return {key: normalize(field) for key, field in value.items()}
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()  # numpy scalar
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+
+    return value
+# End of normalize()
+
+
+def run(function: Callable, call: Callable, feeds: dict[str, bytes]
+        ) -> tuple[Any, float]:
+    """
+    Run a formatter on feeds; returns (normalized result, seconds). Only the
+    formatter itself is timed, not making its inputs, running the event loop
+    (for async ones) or normalizing the result.
+    """
+
+    elapsed = 0.0
+
+    if inspect.iscoroutinefunction(function):
+        async def timed(*args, **kwargs) -> Any:
+            nonlocal elapsed
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                elapsed += time.perf_counter() - start
+    else:
+        def timed(*args, **kwargs) -> Any:
+            nonlocal elapsed
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed += time.perf_counter() - start
+
+    try:
+        result = call(timed, feeds)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        result = normalize(result)
+    except Exception as error:  # An exception is a result too
+        result = ("raised", type(error).__name__)
+
+    return result, elapsed
+# End of run()
+
+
+def differences(reference: Any, candidate: Any, path: str = ""
+                ) -> list[tuple[str, Any, Any]]:
+    """Every (path, reference value, candidate value) which differs."""
+
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        found = []
+        for key in reference.keys() | candidate.keys():
+            found += differences(reference.get(key, "<missing>"),
+                                 candidate.get(key, "<missing>"),
+                                 f"{path}[{key!r}]")
+        return found
+
+    if reference != candidate or type(reference) is not type(candidate):
+        return [(path or "<result>", reference, candidate)]
+
+    return []
+# End of differences()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--candidate", help="module having ENGINE dict")
+    parser.add_argument("--random", type=int, default=20,
+                        help="number of randomized cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="paired timing runs per case")
+    parser.add_argument("--show", type=int, default=10,
+                        help="differences shown per formatter")
+    args = parser.parse_args()
+
+    if args.candidate is None:
+        engine = REFERENCE_ENGINE
+    else:
+        engine = importlib.import_module(args.candidate).ENGINE
+
+    cases = {**fixture_cases(), **random_cases(args.random, args.seed)}
+    found_any = False
+
+    print(f"{len(cases)} cases\n")
+
+    for name, candidate in engine.items():
+        reference, call = REFERENCE_ENGINE[name], CALLS[name]
+        diffs: list[tuple[str, str, Any, Any]] = []
+        timings: dict[str, list[float]] = {"reference": [], "candidate": []}
+        ratios = []
+
+        for case, feeds in cases.items():
+            # Alternate the order of runs, so that neither gets warm caches
+            # more often than the other
+            for repeat in range(args.repeat):
+                order = [("reference", reference), ("candidate", candidate)]
+                if repeat % 2:
+                    order.reverse()
+
+                results = {}
+                for label, function in order:
+                    results[label], seconds = run(function, call, feeds)
+                    timings[label].append(seconds)
+
+                ratios.append(timings["reference"][-1]
+                              / timings["candidate"][-1])
+
+            diffs += [(case, *diff) for diff in
+                      differences(results["reference"],
+                                  results["candidate"])]
+
+        found_any = found_any or bool(diffs)
+        differing_cases = len({diff[0] for diff in diffs})
+
+        print(f"{name}: {len(cases) - differing_cases}/{len(cases)} cases "
+              f"equal, {len(diffs)} differing fields")
+        reference_ms = statistics.median(timings["reference"]) * 1000
+        candidate_ms = statistics.median(timings["candidate"]) * 1000
+        print(f"  reference {reference_ms:.2f} ms, candidate "
+              f"{candidate_ms:.2f} ms (median), speedup "
+              f"x{statistics.median(ratios):.2f} (median of paired runs)")
+
+        for case, path, ref_value, candidate_value in diffs[:args.show]:
+            print(f"  {case}{path}: reference={ref_value!r} "
+                  f"candidate={candidate_value!r}")
+        if len(diffs) > args.show:
+            print(f"  ... and {len(diffs) - args.show} more")
+        print()
+
+    return 1 if found_any else 0
+# End of main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+# End of file
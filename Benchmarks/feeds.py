@@ -0,0 +1,369 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Synthetic covid19india feeds, shaped and sized like the real ones, and a
+local stub server serving them. Since the API is deprecated, these are what
+the benchmarks run refreshes against.
+"""
+
+
+# Import standard library dependencies
+import asyncio
+import csv
+from datetime import date, datetime, timedelta
+import gzip
+from io import StringIO
+import json
+import random
+from typing import Any, Optional
+import zlib
+
+# Import external dependencies
+from aiohttp import web
+
+
+# States/UTs with their codes, as in state_wise.csv
+STATES = [
+    ("Total", "TT"), ("Maharashtra", "MH"), ("Kerala", "KL"),
+    ("Karnataka", "KA"), ("Tamil Nadu", "TN"), ("Andhra Pradesh", "AP"),
+    ("Uttar Pradesh", "UP"), ("West Bengal", "WB"), ("Delhi", "DL"),
+    ("Chhattisgarh", "CT"), ("Odisha", "OR"), ("Rajasthan", "RJ"),
+    ("Gujarat", "GJ"), ("Madhya Pradesh", "MP"), ("Haryana", "HR"),
+    ("Bihar", "BR"), ("Telangana", "TG"), ("Punjab", "PB"), ("Assam", "AS"),
+    ("Jharkhand", "JH"), ("Uttarakhand", "UT"), ("Jammu and Kashmir", "JK"),
+    ("Himachal Pradesh", "HP"), ("Goa", "GA"), ("Puducherry", "PY"),
+    ("Manipur", "MN"), ("Tripura", "TR"), ("Meghalaya", "ML"),
+    ("Chandigarh", "CH"), ("Arunachal Pradesh", "AR"), ("Mizoram", "MZ"),
+    ("Nagaland", "NL"), ("Sikkim", "SK"), ("Ladakh", "LA"),
+    ("Dadra and Nagar Haveli and Daman and Diu", "DN"),
+    ("Lakshadweep", "LD"),
+    ("Andaman and Nicobar Islands", "AN"), ("State Unassigned", "UN"),
+]
+
+# Districts having the same name in two states, like the real data has
+SHARED_DISTRICTS = {"Aurangabad": ("MH", "BR"), "Bilaspur": ("CT", "HP"),
+                    "Hamirpur": ("UP", "HP"), "Pratapgarh": ("UP", "RJ")}
+
+DISTRICTS_PER_STATE = 20
+
+VACCINATION_COLUMNS = [
+    "First Dose Administered", "Second Dose Administered",
+    "Male (Doses Administered)", "Female (Doses Administered)",
+    "Transgender (Doses Administered)", "Covaxin (Doses Administered)",
+    "CoviShield (Doses Administered)", "Sputnik V (Doses Administered)",
+]
+
+
+def district_names(state_code: str) -> list[str]:
+    """Names of districts of a state (none for Total)."""
+
+    if state_code == "TT":
+        return []
+    if state_code == "UN":
+        return ["Unknown"]
+
+    names = [f"{state_code} District {i}" for i in range(DISTRICTS_PER_STATE)]
+    names += [name for name, codes in SHARED_DISTRICTS.items()
+              if state_code in codes]
+
+    return names
+# End of district_names()
+
+
+def synthetic_feeds(
+    *,
+    seed: int = 0,
+    day: int = 0,
+    history: int = 300,
+    today: Optional[date] = None
+) -> dict[str, bytes]:
+    """
+    Make bodies of all the feeds, with keys being the names used in
+    covid_stats_update.FEED_PATHS. Increasing day moves the data (and dates)
+    one day ahead, keeping the same seed makes the same series.
+    """
+
+    today = (today or date.today()) + timedelta(days=day)
+    last_updated = datetime.combine(today, datetime.min.time()).replace(
+        hour=10, minute=day % 60
+    )
+
+    def series(*key: Any) -> random.Random:
+        """Same random numbers for a key, irrespective of day."""
+        return random.Random(zlib.crc32(repr((seed,) + key).encode()))
+
+    def cumulative(rng: random.Random, days: int) -> list[int]:
+        """Cumulative counts for the last days (oldest first)."""
+
+        value, values = rng.randint(10 ** 3, 10 ** 6), []
+        for _ in range(days):
+            value += rng.randint(0, 10 ** 4)
+            values.append(value)
+
+        return values
+    # End of cumulative()
+
+    feeds = {}
+
+    # v4/min/data.min.json and state_wise.csv
+
+    data_json = {}
+    state_rows = []
+
+    for state, state_code in STATES:
+        rng = series("state", state_code)
+        confirmed = cumulative(rng, history + day + 1)
+        today_confirmed = confirmed[-1]
+        delta = confirmed[-1] - confirmed[-2]
+
+        total = {"confirmed": today_confirmed,
+                 "recovered": today_confirmed * 9 // 10,
+                 "deceased": today_confirmed // 80,
+                 "other": rng.randint(0, 50),
+                 "tested": today_confirmed * 12}
+
+        if state_code != "UN":  # Not in json
+            data_json[state_code] = {
+                "delta": {"confirmed": delta, "recovered": delta * 9 // 10,
+                          "deceased": delta // 80},
+                "delta7": {"confirmed": delta * 7},
+                "meta": {"date": today.isoformat(),
+                         "last_updated": last_updated.isoformat() + "+05:30",
+                         "notes": "",
+                         "population": rng.randint(10 ** 5, 10 ** 8)},
+                "total": total,
+                "districts": {},
+            }
+
+        state_rows.append([
+            state, total["confirmed"] - 1000, total["recovered"] - 1000,
+            total["deceased"], total["confirmed"] - total["recovered"],
+            "31/10/2021 23:01:48", total["other"], state_code,
+            delta, delta * 9 // 10, delta // 80,
+            "Old csv notes" if rng.random() < 0.1 else ""
+        ])
+
+    feeds["state"] = make_csv(
+        ["State", "Confirmed", "Recovered", "Deaths", "Active",
+         "Last_Updated_Time", "Migrated_Other", "State_code",
+         "Delta_Confirmed", "Delta_Recovered", "Delta_Deaths", "State_Notes"],
+        state_rows
+    )
+
+    # district_wise.csv (and districts in the json)
+
+    district_rows = []
+    for state, state_code in STATES:
+        for district in district_names(state_code):
+            rng = series("district", state_code, district)
+            confirmed = cumulative(rng, history + day + 1)[-2:]
+            delta = confirmed[1] - confirmed[0]
+            recovered, deceased = confirmed[1] * 9 // 10, confirmed[1] // 80
+
+            if state_code in data_json:
+                data_json[state_code]["districts"][district] = {
+                    "delta": {"confirmed": delta},
+                    "meta": {"population": rng.randint(10 ** 4, 10 ** 7)},
+                    "total": {"confirmed": confirmed[1],
+                              "recovered": recovered, "deceased": deceased},
+                }
+
+            district_rows.append([
+                len(district_rows) + 1, state_code, state,
+                f"{state_code}_{district}", district, confirmed[1],
+                confirmed[1] - recovered - deceased, recovered, deceased, 0,
+                delta, delta // 10, delta * 9 // 10, delta // 80, "", ""
+            ])
+
+    feeds["district"] = make_csv(
+        ["SlNo", "State_Code", "State", "District_Key", "District",
+         "Confirmed", "Active", "Recovered", "Deceased", "Migrated_Other",
+         "Delta_Confirmed", "Delta_Active", "Delta_Recovered",
+         "Delta_Deceased", "District_Notes", "Last_Updated"],
+        district_rows
+    )
+
+    feeds["state_json"] = json.dumps(data_json,
+                                     separators=(",", ":")).encode()
+
+    # statewise_tested_numbers_data.csv and vaccine_doses_statewise_v2.csv
+    # (one row per state per day, oldest first, like the real ones)
+
+    test_rows, vaccination_rows = [], []
+    for state, state_code in STATES[1:-1]:
+        rng = series("tests", state_code)
+        tested = cumulative(rng, history + day)
+        doses = cumulative(series("vaccination", state_code), history + day)
+
+        for index in range(day, history + day):
+            row_date = today - timedelta(days=history + day - 1 - index)
+            date_str = row_date.strftime("%d/%m/%Y")
+
+            # Some days aren't reported, like the real data
+            test_rows.append([
+                date_str, state,
+                tested[index] if rng.random() > 0.05 else "",
+                tested[index] // 20,
+                f"https://example.com/{state_code}/{index}.pdf"
+            ])
+
+            total = doses[index]
+            first = total * 2 // 3
+            vaccination_rows.append([
+                date_str, state, total, first, total - first,
+                total // 2, total // 2 - 10, 10,
+                total // 8, total * 7 // 8 - 5, 5
+            ])
+
+    feeds["tests"] = make_csv(
+        ["Updated On", "State", "Total Tested", "Positive", "Source1"],
+        test_rows
+    )
+    feeds["vaccination"] = make_csv(
+        ["Vaccinated As of", "State", "Total Doses Administered"]
+        + VACCINATION_COLUMNS,
+        vaccination_rows
+    )
+
+    # tested_numbers_icmr_data.csv
+
+    samples = cumulative(series("icmr"), history + day)
+    icmr_rows = []
+    for index in range(day, history + day):
+        row_date = today - timedelta(days=history + day - 1 - index)
+        icmr_rows.append([
+            row_date.strftime("%d/%m/%Y"),
+            row_date.strftime("%d/%m/%Y") + " 09:00:00",
+            samples[index] - samples[index - 1] if index else "",
+            samples[index],
+            f"https://example.com/icmr/{index}.pdf"
+        ])
+
+    feeds["icmr"] = make_csv(
+        ["Tested As Of", "Update Time Stamp", "Sample Reported today",
+         "Total Samples Tested", "Source"],
+        icmr_rows
+    )
+
+    return feeds
+# End of synthetic_feeds()
+
+
+def make_csv(header: list[str], rows: list[list[Any]]) -> bytes:
+    """Make csv bytes from a header and rows."""
+
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+
+    return buffer.getvalue().encode()
+# End of make_csv()
+
+
+class StubUpstream:
+    """
+    Local server standing in for data.covid19india.org. Bodies are gzipped
+    when the client accepts it, and each new connection can be delayed to
+    make up for the TCP + TLS handshakes a real host would need. Idle
+    connections are closed after keepalive_timeout seconds (aiohttp's
+    default).
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_delay: float = 0.0,
+        keepalive_timeout: float = 75.0
+    ) -> None:
+        self.connect_delay = connect_delay
+        self.keepalive_timeout = keepalive_timeout
+        self.paths: dict[str, str] = {}  # Path -> feed name
+        self._bodies: dict[str, tuple[bytes, bytes]] = {}  # Plain, gzipped
+        self._runner: Optional[web.AppRunner] = None
+        self.reset_metrics()
+
+    def reset_metrics(self) -> None:
+        self.requests = 0
+        self.bytes_sent = 0
+        self._connections: set[int] = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    def set_feeds(
+        self,
+        paths: dict[str, str],
+        feeds: dict[str, bytes]
+    ) -> None:
+        """Serve feeds[name] at paths[name]."""
+
+        self.paths = {path: name for name, path in paths.items()}
+        self._bodies = {name: (body, gzip.compress(body, 6))
+                        for name, body in feeds.items()}
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        transport = id(request.transport)
+        if transport not in self._connections:  # New connection
+            self._connections.add(transport)
+            if self.connect_delay:
+                await asyncio.sleep(self.connect_delay)
+
+        if (name := self.paths.get(request.path)) not in self._bodies:
+            raise web.HTTPNotFound()
+
+        self.requests += 1
+        plain, compressed = self._bodies[name]
+
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            self.bytes_sent += len(compressed)
+            return web.Response(body=compressed,
+                                headers={"Content-Encoding": "gzip"})
+
+        self.bytes_sent += len(plain)
+        return web.Response(body=plain)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, and return the base URL."""
+
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._handle)
+
+        self._runner = web.AppRunner(
+            app, access_log=None, keepalive_timeout=self.keepalive_timeout
+        )
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+# End of StubUpstream class
+
+
+# End of file
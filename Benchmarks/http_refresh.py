@@ -0,0 +1,144 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Compare fetching the feeds with a fresh aiohttp session per refresh (fetching
+one feed after another, as was done before) against the cog's pooled session
+(fetching all together), on a local stub server.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.http_refresh [--refreshes N]
+                                                         [--connect-ms MS]
+                                                         [--gap S]
+                                                         [--server-keepalive S]
+
+--connect-ms delays every new connection on the stub, standing in for the
+TCP + TLS handshakes (and DNS lookup) that the real host needs. --gap is the
+time waited between refreshes, by default the shortest gap between polls of
+a feed (so a run takes a while). --server-keepalive is how long the stub
+keeps idle connections open; connections are reused across refreshes only
+if both it and the client's keep-alive outlast the gap.
+"""
+
+
+# Import standard library dependencies
+import argparse
+import asyncio
+import statistics
+import time
+
+# Import external dependencies
+import aiohttp
+
+# Import things to benchmark
+from ..covid_stats_update import FEED_PATHS
+from ..Fetch.http import close_http_session, fetch_feed, get_http_session
+from ..Fetch.schedule import MIN_INTERVAL
+from .feeds import StubUpstream, synthetic_feeds
+
+
+async def fetch_fresh_session(host: str) -> dict[str, bytes]:
+    """How feeds were fetched before: new session, one feed at a time."""
+
+    bodies = {}
+    async with aiohttp.ClientSession() as session:
+        for name, path in FEED_PATHS.items():
+            async with session.get(host + path) as resp:
+                bodies[name] = await resp.read()
+
+    return bodies
+# End of fetch_fresh_session()
+
+
+class Cog:
+    """Stands in for the cog, which keeps the session."""
+# End of Cog class
+
+
+async def fetch_pooled(cog: Cog, host: str) -> dict[str, bytes]:
+    """How feeds are fetched now (see covid_stats_update())."""
+
+    session = get_http_session(cog)
+    bodies = await asyncio.gather(*(fetch_feed(session, host + path)
+                                    for path in FEED_PATHS.values()))
+
+    return dict(zip(FEED_PATHS, bodies))
+# End of fetch_pooled()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--refreshes", type=int, default=10)
+    parser.add_argument("--connect-ms", type=float, default=50)
+    parser.add_argument("--gap", type=float, default=MIN_INTERVAL)
+    parser.add_argument("--server-keepalive", type=float, default=75)
+    args = parser.parse_args()
+
+    stub = StubUpstream(connect_delay=args.connect_ms / 1000,
+                        keepalive_timeout=args.server_keepalive)
+    feeds = synthetic_feeds()
+    stub.set_feeds(FEED_PATHS, feeds)
+    host = await stub.start()
+
+    plain_size = sum(len(body) for body in feeds.values())
+    print(f"Feeds: {plain_size / 1024:.0f} KiB uncompressed, "
+          f"{args.connect_ms:.0f} ms per new connection, {args.gap:.0f} s "
+          f"between refreshes, server keep-alive {args.server_keepalive:.0f} "
+          f"s\n")
+    print(f"{'mode':<16}{'median ms':>11}{'max ms':>9}"
+          f"{'conns':>7}{'wire KiB':>10}")
+
+    cog = Cog()
+    modes = {
+        "fresh session": lambda: fetch_fresh_session(host),
+        "pooled": lambda: fetch_pooled(cog, host),
+    }
+
+    try:
+        for mode, fetch in modes.items():
+            stub.reset_metrics()
+            timings = []
+
+            for refresh in range(args.refreshes):
+                if refresh:  # Like the time between polls of the cog
+                    await asyncio.sleep(args.gap)
+
+                start = time.perf_counter()
+                bodies = await fetch()
+                timings.append((time.perf_counter() - start) * 1000)
+
+                assert bodies == feeds, "Stub served something else"
+
+            print(f"{mode:<16}{statistics.median(timings):>11.1f}"
+                  f"{max(timings):>9.1f}{stub.connections:>7}"
+                  f"{stub.bytes_sent / args.refreshes / 1024:>10.0f}")
+    finally:
+        await close_http_session(cog)
+        await stub.stop()
+# End of main()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+
+# End of file
@@ -0,0 +1,194 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Benchmark decoding of v4/min/data.min.json, with the standard library and
+orjson (if installed), extracting the needed fields after decoding, and
+while decoding through an object_hook (as the cog does).
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.json_decode [path/to/data.min.json]
+
+Without a path, a synthetic payload shaped (and sized) like the real one is
+used, since the covid19india API is deprecated now.
+"""
+
+
+# Import standard library dependencies
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+# Import functions to benchmark
+from ..Format import json_decode
+from ..Format.json_decode import (decode_data_json, extract_district_json,
+                                  extract_state_json)
+
+
+# Roughly the number of states/UTs, and districts per state in the real data
+STATES = 37
+DISTRICTS_PER_STATE = 21
+
+RUNS = 20
+
+
+def synthetic_payload(seed: int = 0) -> bytes:
+    """Make a payload with the same layout as v4/min/data.min.json"""
+
+    rng = random.Random(seed)
+
+    def counts() -> dict[str, int]:
+        return {
+            "confirmed": rng.randint(0, 10 ** 7),
+            "recovered": rng.randint(0, 10 ** 7),
+            "deceased": rng.randint(0, 10 ** 5),
+            "tested": rng.randint(0, 10 ** 8),
+            "vaccinated1": rng.randint(0, 10 ** 7),
+            "vaccinated2": rng.randint(0, 10 ** 7),
+        }
+
+    def location() -> dict[str, Any]:
+        return {
+            "delta": counts(),
+            "delta21_14": {"confirmed": rng.randint(0, 10 ** 4)},
+            "delta7": counts(),
+            "meta": {
+                "population": rng.randint(10 ** 5, 10 ** 8),
+                "tested": {"last_updated": "2021-10-30",
+                           "source": "https://example.com/bulletin.pdf"},
+                "vaccinated": {"last_updated": "2021-10-30"},
+            },
+            "total": counts(),
+        }
+
+    data = {}
+    for state_index in range(STATES):
+        state = location()
+        state["meta"].update({
+            "date": "2021-10-31",
+            "last_updated": "2021-10-31T09:12:46+05:30",
+            "notes": "",
+        })
+        state["districts"] = {
+            f"District {state_index}-{district_index}": location()
+            for district_index in range(DISTRICTS_PER_STATE)
+        }
+        data[f"S{state_index:02d}"] = state
+
+    return json.dumps(data, separators=(",", ":")).encode()
+# End of synthetic_payload()
+
+
+def measure(function: Callable[[], Any]) -> tuple[float, float, int]:
+    """Median and best time (in ms), and peak traced memory (in bytes)."""
+
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return statistics.median(timings), min(timings), peak
+# End of measure()
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            body = f.read()
+    else:
+        body = synthetic_payload()
+
+    print(f"Payload size: {len(body) / 1024:.0f} KiB\n")
+
+    decoders = {"json": json.loads}
+    if json_decode.orjson is not None:
+        decoders["orjson"] = json_decode.orjson.loads
+    else:
+        print("orjson isn't installed, only the standard library is tested.\n")
+
+    print(f"{'case':<32}{'median ms':>12}{'best ms':>12}{'peak KiB':>12}")
+
+    for name, loads in decoders.items():
+        def decode_only() -> Any:
+            return loads(body)
+
+        def decode_and_extract() -> Any:
+            data = loads(body)
+            return extract_state_json(data), extract_district_json(data)
+
+        cases = {
+            f"{name}: decode": decode_only,
+            f"{name}: decode + extract": decode_and_extract,
+        }
+
+        for case, function in cases.items():
+            median, best, peak = measure(function)
+            print(f"{case:<32}{median:>12.2f}{best:>12.2f}"
+                  f"{peak / 1024:>12.0f}")
+
+    # Extracting while decoding, which the cog does
+    hooked_cases = {
+        "json hook: states": lambda: decode_data_json(body),
+        "json hook: states + districts": lambda: decode_data_json(
+            body, districts=True
+        ),
+    }
+
+    for case, function in hooked_cases.items():
+        median, best, peak = measure(function)
+        print(f"{case:<32}{median:>12.2f}{best:>12.2f}{peak / 1024:>12.0f}")
+
+    # Memory retained after extraction (what stays alive till next refresh)
+    for name, loads in decoders.items():
+        tracemalloc.start()
+        data = loads(body)
+        full = tracemalloc.get_traced_memory()[0]
+        states = extract_state_json(data)
+        districts = extract_district_json(data)
+        del data
+        both = tracemalloc.get_traced_memory()[0]
+        del districts
+        states_only = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del states
+
+        print(f"\n{name}: retained {full / 1024:.0f} KiB when fully decoded, "
+              f"{both / 1024:.0f} KiB for states + districts, "
+              f"{states_only / 1024:.0f} KiB for states only")
+# End of main()
+
+
+if __name__ == "__main__":
+    main()
+
+
+# End of file
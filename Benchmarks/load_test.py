@@ -0,0 +1,288 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Load test for the covid command. Many workers keep invoking corona() with
+fake contexts (a realistic mix of national, state (some with vaccination
+breakdown), state code, district, ambiguous district and unknown queries),
+while the data is refreshed periodically from a local stub upstream. Reports
+throughput, latency percentiles and event loop lag, separately for when a
+refresh is running.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.load_test [--workers N]
+        [--duration S] [--refresh-every S] [--channels N]
+        [--coalesce-window S] [--rate-limit]
+
+Embeds are made by a stub of create_embed() and nothing is sent to Discord,
+so this measures the command itself (and refreshes) and not the network.
+"""
+
+
+# Import standard library dependencies
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+# Import discord.py stuff
+import discord
+
+# Import things to load test
+from .. import covid as covid_module
+from ..covid_stats_update import FEED_PATHS, covid_stats_update
+from ..Dispatch.coalesce import ResponseCoalescer
+from ..Fetch.http import close_http_session
+from .feeds import STATES, SHARED_DISTRICTS, StubUpstream, district_names
+from .feeds import synthetic_feeds
+
+
+# Share of each kind of query in the mix
+QUERY_MIX = {
+    "national": 0.25,
+    "state": 0.25,
+    "state_vaccination": 0.05,
+    "state_code": 0.10,
+    "district": 0.20,
+    "ambiguous_district": 0.05,
+    "district_with_state": 0.05,
+    "miss": 0.05,
+}
+
+LAG_PROBE_INTERVAL = 0.01  # Seconds
+
+
+def make_queries(count: int, seed: int = 0) -> list[str]:
+    """Make a list of queries following QUERY_MIX."""
+
+    rng = random.Random(seed)
+    states = [(state, code) for state, code in STATES if code != "TT"]
+    districts = [district for _, code in states
+                 for district in district_names(code)
+                 if district not in SHARED_DISTRICTS]
+
+    makers = {
+        "national": lambda: rng.choice(["", "India", "india"]),
+        "state": lambda: rng.choice(states)[0].lower(),
+        "state_vaccination": lambda: (rng.choice(states)[0]
+                                      + " --vaccination"),
+        "state_code": lambda: rng.choice(states)[1].lower(),
+        "district": lambda: rng.choice(districts),
+        "ambiguous_district": lambda: rng.choice(list(SHARED_DISTRICTS)),
+        "district_with_state": lambda: (
+            (district := rng.choice(list(SHARED_DISTRICTS)))
+            + ", " + rng.choice(SHARED_DISTRICTS[district]).lower()
+        ),
+        "miss": lambda: rng.choice(["Atlantis", "Gotham, mh", "Narnia"]),
+    }
+
+    kinds = rng.choices(list(QUERY_MIX), weights=QUERY_MIX.values(), k=count)
+    return [makers[kind]() for kind in kinds]
+# End of make_queries()
+
+
+class FakeContext:
+    """Just enough of commands.Context for corona()"""
+
+    interaction = None
+
+    def __init__(self, channel_id: int, author_id: int) -> None:
+        self.channel = SimpleNamespace(id=channel_id)
+        self.author = SimpleNamespace(id=author_id,
+                                      mention=f"<@{author_id}>")
+        self.message = None
+
+    async def send(self, content: str = None, **kwargs) -> None:
+        await asyncio.sleep(0)  # Stands in for the (awaited) API call
+# End of FakeContext class
+
+
+class FakeLoop:
+    """Stands in for the cog's corona_stats_update task loop."""
+
+    def is_running(self) -> bool:
+        return True
+
+    def restart(self) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def change_interval(self, **kwargs) -> None:
+        pass
+# End of FakeLoop class
+
+
+class FakeCog:
+    """Has the attributes of the cog used by corona()"""
+
+    def __init__(
+        self,
+        host: str,
+        coalesce_window: float,
+        rate_limit: bool
+    ) -> None:
+        self.bot = SimpleNamespace(owner_id=None)
+        self.corona_stats_update = FakeLoop()
+        self.covid_api_host = host
+
+        # Without the rate limit, what the process can serve is measured
+        # instead of what Discord would allow
+        self.covid_coalescer = ResponseCoalescer(window=coalesce_window)
+        if not rate_limit:
+            self.covid_coalescer.rate = 10 ** 9
+
+    def get_asset_url(self, name: str) -> str:
+        return f"https://example.com/{name}"
+# End of FakeCog class
+
+
+def stub_create_embed(ctx, *, error: bool = False, title: str = None,
+                      description: str = None, footer: str = None,
+                      thumbnail: str = None) -> discord.Embed:
+    """Makes a plain embed, like Factory.embed.create_embed() would."""
+
+    embed = discord.Embed(title=title, description=description)
+    if footer is not None:
+        embed.set_footer(text=footer)
+    if thumbnail is not None:
+        embed.set_thumbnail(url=thumbnail)
+
+    return embed
+# End of stub_create_embed()
+
+
+def percentiles(values: list[float]) -> str:
+    """p50/p90/p99/max of values (in ms)."""
+
+    if len(values) < 2:
+        return "n/a"
+
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return (f"p50 {cuts[49]:.2f}  p90 {cuts[89]:.2f}  p99 {cuts[98]:.2f}  "
+            f"max {max(values):.2f}")
+# End of percentiles()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--refresh-every", type=float, default=5,
+                        help="seconds between (forced) refreshes")
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--coalesce-window", type=float, default=0,
+                        help="coalescing window (0 measures only the "
+                             "command, >0 adds coalescing to latency)")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="hold sends to Discord's channel rate limit")
+    args = parser.parse_args()
+
+    covid_module.create_embed = stub_create_embed
+    corona = covid_module.corona.callback
+
+    stub = StubUpstream()
+    stub.set_feeds(FEED_PATHS, synthetic_feeds())
+    cog = FakeCog(await stub.start(), args.coalesce_window,
+                  args.rate_limit)
+    await covid_stats_update(cog, restart_loop=True)  # Initial data
+
+    queries = make_queries(10_000)
+    latencies = {False: [], True: []}  # Refresh running -> latencies (ms)
+    lags = {False: [], True: []}
+    refresh_times = []
+    refreshing = False
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(worker_id)
+        while time.perf_counter() < deadline:
+            ctx = FakeContext(rng.randrange(args.channels), worker_id)
+            during_refresh = refreshing
+            start = time.perf_counter()
+            await corona(cog, ctx, location=rng.choice(queries) or "Total")
+            latencies[during_refresh].append(
+                (time.perf_counter() - start) * 1000
+            )
+
+    async def lag_probe() -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = time.perf_counter() - start - LAG_PROBE_INTERVAL
+            lags[refreshing].append(lag * 1000)
+
+    async def refresher() -> None:
+        nonlocal refreshing
+        day = 0
+        while True:
+            await asyncio.sleep(min(args.refresh_every,
+                                    deadline - time.perf_counter()))
+            if time.perf_counter() >= deadline:
+                return
+
+            day += 1  # New data each time, so everything gets formatted
+            stub.set_feeds(FEED_PATHS, synthetic_feeds(day=day))
+
+            refreshing = True
+            start = time.perf_counter()
+            await covid_stats_update(cog, restart_loop=True)
+            refresh_times.append((time.perf_counter() - start) * 1000)
+            refreshing = False
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(i) for i in range(args.workers)),
+                             lag_probe(), refresher())
+    finally:
+        await close_http_session(cog)
+        await stub.stop()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    metrics = cog.covid_coalescer.metrics()
+
+    print(f"{args.workers} workers, {args.channels} channels, "
+          f"{elapsed:.1f} s, {len(refresh_times)} refreshes\n")
+    print(f"Throughput: {total / elapsed:.0f} commands/s "
+          f"({total} commands, coalescing ratio "
+          f"{metrics['coalescing_ratio']:.2f})")
+
+    for during_refresh, label in ((False, "idle"), (True, "refreshing")):
+        print(f"\nWhile {label}:")
+        print(f"  commands:        {len(latencies[during_refresh])}")
+        print(f"  latency (ms):    {percentiles(latencies[during_refresh])}")
+        print(f"  loop lag (ms):   {percentiles(lags[during_refresh])}")
+
+    if refresh_times:
+        print(f"\nRefresh time (ms): {percentiles(refresh_times)}")
+# End of main()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+
+# End of file
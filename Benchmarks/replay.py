@@ -0,0 +1,280 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Replay feeds recorded with COVID_RECORD_PATH (see Fetch/recorder.py) through
+covid_stats_update() and the formatters, to see how refreshes behave with
+how the data really changed over time. Reports, for each recorded poll, the
+time the refresh took, the time parsing every feed again would take, how
+many records changed, and memory.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Benchmarks.replay ARCHIVE [--speed X]
+        [--limit N] [--trace]
+    python -m Cogs.Utility.Covid.Benchmarks.replay ARCHIVE --synthetic DAYS
+
+At each poll the stub upstream serves what was recorded, and the same feeds
+as were polled then are polled. Recorded gaps between polls are waited out
+divided by --speed (0, the default, doesn't wait at all).
+
+--synthetic first records DAYS days of synthetic feeds to ARCHIVE (each feed
+being published at its own time of day, and polled as the feed scheduler
+would), since the real API can't be recorded anymore.
+--trace turns on tracemalloc, for allocations per refresh.
+"""
+
+
+# Import standard library dependencies
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import math
+import os
+import statistics
+import time
+from typing import Any
+
+# Import things to replay through
+from ..covid_stats_update import FEED_PATHS, covid_stats_update
+from ..Diagnostics.memory import MemoryMonitor, format_bytes
+from ..Fetch.http import close_http_session
+from ..Fetch.recorder import FeedArchive
+from ..Fetch.schedule import FeedScheduler
+from ..Format.district import format_district_stats
+from ..Format.json_decode import decode_data_json, extract_state_json
+from ..Format.records import Record
+from ..Format.state import format_state_stats
+from ..Format.tests import format_test_stats
+from ..Format.vaccination import format_vaccination_stats
+from .feeds import StubUpstream, synthetic_feeds
+
+
+# Attributes of the cog whose records are compared after each refresh
+STATS = {
+    "state": "covid_state_stats",
+    "district": "covid_district_stats",
+    "tests": "covid_test_stats",
+    "vaccination": "covid_vaccination_stats",
+}
+
+# Seconds since midnight (UTC) at which each synthetic feed is published
+PUBLISH_TIMES = {
+    "icmr": 9 * 3600,
+    "state": 10 * 3600,
+    "state_json": 10 * 3600,
+    "district": 10 * 3600 + 15 * 60,
+    "tests": 12 * 3600,
+    "vaccination": 14 * 3600,
+}
+
+
+def record_synthetic(archive: FeedArchive, days: int) -> None:
+    """Record polls of synthetic feeds over days, as the scheduler does."""
+
+    start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) - timedelta(days=days)
+    start_time, end_time = start.timestamp(), start.timestamp() + days * 86400
+
+    generated: dict[int, dict[str, bytes]] = {}
+
+    def body(name: str, now: float) -> bytes:
+        """Body of a feed at a time (last published day's one)."""
+
+        day = math.floor((now - start_time - PUBLISH_TIMES[name]) / 86400)
+        if day not in generated:
+            generated[day] = synthetic_feeds(day=day, today=start.date())
+            generated.pop(day - 2, None)
+
+        return generated[day][name]
+    # End of body()
+
+    scheduler = FeedScheduler(FEED_PATHS)
+    now = start_time
+
+    while now < end_time:
+        fetched = {name: body(name, now) for name in scheduler.due(now)}
+        for name, feed_body in fetched.items():
+            scheduler.observe(name, feed_body, now)
+
+        archive.add(fetched, now)
+        now += scheduler.seconds_until(now=now)
+# End of record_synthetic()
+
+
+def flatten(stats: Any, key: tuple = ()) -> dict[tuple, Record]:
+    """Records in (possibly nested) dicts of records, by their keys."""
+
+    if isinstance(stats, Record):
+        return {key: stats}
+
+    records = {}
+    for name, value in stats.items():
+        records.update(flatten(value, key + (name,)))
+
+    return records
+# End of flatten()
+
+
+def changed_records(old: dict, new: dict) -> int:
+    """Number of records added, removed or changed from old to new."""
+
+    old, new = flatten(old), flatten(new)
+    return sum(old.get(key) != new.get(key) for key in old.keys() | new.keys())
+# End of changed_records()
+
+
+async def full_parse(bodies: dict[str, bytes]) -> None:
+    """Parse every feed, like a refresh without skipping unchanged ones."""
+
+    state_json = extract_state_json(decode_data_json(bodies["state_json"]))
+    await format_state_stats(StringIO(bodies["state"].decode()), state_json)
+    await format_district_stats(StringIO(bodies["district"].decode()))
+    format_test_stats(StringIO(bodies["tests"].decode()),
+                      StringIO(bodies["icmr"].decode()))
+    format_vaccination_stats(StringIO(bodies["vaccination"].decode()))
+# End of full_parse()
+
+
+class Cog:
+    """Stands in for the cog, which keeps the data."""
+# End of Cog class
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("archive", help="directory recorded to")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="replay speed (0 doesn't wait between polls)")
+    parser.add_argument("--limit", type=int, help="replay first N polls")
+    parser.add_argument("--trace", action="store_true",
+                        help="measure allocations with tracemalloc")
+    parser.add_argument("--synthetic", type=int, metavar="DAYS",
+                        help="record synthetic feeds for DAYS days first")
+    args = parser.parse_args()
+
+    archive = FeedArchive(args.archive)
+    if args.synthetic:
+        record_synthetic(archive, args.synthetic)
+
+    polls = list(archive.polls())[:args.limit]
+    if not polls:
+        print(f"Nothing recorded in {args.archive}")
+        return
+
+    hashes = [digest for _, feeds in polls for digest in feeds.values()]
+    disk = sum(entry.stat().st_size
+               for entry in os.scandir(archive.bodies_path))
+    print(f"{len(polls)} polls of {len(hashes)} feeds, "
+          f"{len(set(hashes))} different bodies ({format_bytes(disk)} on "
+          f"disk)\n")
+
+    stub = StubUpstream()
+    host = await stub.start()
+
+    cog = Cog()
+    cog.covid_api_host = host
+    cog.covid_memory_monitor = MemoryMonitor(trace=args.trace)
+
+    # Don't let the environment make the replay record polls (maybe into the
+    # very archive being replayed), publish snapshots or serve an export
+    cog.covid_record_path = None
+    cog.covid_snapshot_role = None
+    cog.covid_export_port = None
+
+    print(f"{'recorded at':<17}{'polled':>7}{'changed':>8}{'refresh ms':>11}"
+          f"{'full ms':>9}  {'records changed (S/D/T/V)':<26}{'RSS':>10}"
+          f"{'traced peak':>13}")
+
+    bodies: dict[str, bytes] = {}
+    refresh_times, full_times, total_changed = [], [], 0
+    previous_time = None
+
+    try:
+        for poll_time, feeds in polls:
+            if args.speed and previous_time is not None:
+                await asyncio.sleep((poll_time - previous_time) / args.speed)
+            previous_time = poll_time
+
+            bodies.update({name: archive.body(digest)
+                           for name, digest in feeds.items()})
+            stub.set_feeds(FEED_PATHS, bodies)
+
+            # Poll just the feeds which were polled at this time
+            scheduler = getattr(cog, "covid_feed_scheduler", None)
+            if scheduler is not None:
+                for name, feed in scheduler.feeds.items():
+                    feed.next_due = 0 if name in feeds else math.inf
+                changes_before = sum(feed.changes
+                                     for feed in scheduler.feeds.values())
+
+            before = {name: getattr(cog, attribute, {})
+                      for name, attribute in STATS.items()}
+
+            start = time.perf_counter()
+            await covid_stats_update(cog)
+            refresh_times.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await full_parse(bodies)
+            full_times.append((time.perf_counter() - start) * 1000)
+
+            changed = [changed_records(before[name], getattr(cog, attribute))
+                       for name, attribute in STATS.items()]
+            total_changed += sum(changed)
+
+            if scheduler is None:  # First refresh parses everything
+                feeds_changed = len(feeds)
+            else:
+                feeds_changed = sum(feed.changes for feed in
+                                    scheduler.feeds.values()) - changes_before
+
+            memory = cog.covid_memory_monitor.refreshes[-1]
+            traced = ("n/a" if memory.traced_peak is None else
+                      format_bytes(memory.traced_peak - memory.traced_before))
+
+            print(f"{time.strftime('%d %b %H:%M', time.gmtime(poll_time)):<17}"
+                  f"{len(feeds):>7}{feeds_changed:>8}"
+                  f"{refresh_times[-1]:>11.1f}{full_times[-1]:>9.1f}  "
+                  f"{'/'.join(map(str, changed)):<26}"
+                  f"{format_bytes(memory.rss_after):>10}{traced:>13}")
+    finally:
+        await close_http_session(cog)
+        await stub.stop()
+
+    print(f"\nRefresh: median {statistics.median(refresh_times):.1f} ms, "
+          f"total {sum(refresh_times) / 1000:.2f} s")
+    print(f"Full parse: median {statistics.median(full_times):.1f} ms, "
+          f"total {sum(full_times) / 1000:.2f} s")
+    print(f"Records changed: {total_changed}")
+
+    if leak := cog.covid_memory_monitor.possible_leak():
+        print("Possible leak: " + leak)
+# End of main()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+
+# End of file
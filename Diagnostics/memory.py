@@ -0,0 +1,326 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from collections import deque
+from dataclasses import dataclass
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Optional
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Import record base class (to count the records kept alive)
+from ..Format.records import Record
+
+
+# Set COVID_MEMORY_TRACE=1 to trace Python allocations with tracemalloc. It
+# slows down allocation heavy code (like parsing) quite a bit, so it's off by
+# default, and only RSS is measured then.
+TRACE_ALLOCATIONS = os.environ.get("COVID_MEMORY_TRACE", "") == "1"
+
+REFRESHES_KEPT = 16  # Refreshes whose measurements are kept
+
+# Memory retained between refreshes growing at each of this many refreshes in
+# a row (and by at least LEAK_MIN_GROWTH overall) is flagged as a leak
+LEAK_STREAK = 5
+LEAK_MIN_GROWTH = 1 << 20  # Bytes
+
+# Structures of the cog accounted in the report (dotted for attributes of
+# attributes)
+STRUCTURES = (
+    "covid_state_stats",
+    "covid_district_stats",
+    "covid_test_stats",
+    "covid_vaccination_stats",
+    "covid_state_codes",
+    "covid_location_keys",
+    "covid_location_labels",
+    "covid_feed_scheduler",
+    "covid_popularity",
+    "covid_export_server.bodies",
+)
+
+
+def deep_size(obj: Any, seen: set[int] = None) -> tuple[int, int]:
+    """
+    Size in bytes of obj and everything reachable from it through
+    containers and instance attributes, along with the number of records in
+    it. Objects whose id is in seen are skipped (and ids are added to it), so
+    passing the same set counts shared objects only once.
+    """
+
+    if seen is None:
+        seen = set()
+
+    size = 0
+    records = 0
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        # Classes, modules and functions are shared by everything, so are not
+        # counted as a part of any structure
+        if isinstance(obj, (type, type(sys), type(deep_size))):
+            continue
+
+        size += sys.getsizeof(obj)
+        records += isinstance(obj, Record)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, bytearray, int, float)):
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, name):
+                        stack.append(getattr(obj, name))
+
+    return size, records
+# End of deep_size()
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of the process in bytes (None if not known)."""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+# End of current_rss()
+
+
+def peak_rss() -> Optional[int]:
+    """Highest resident set size of the process so far in bytes."""
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # KiB on Linux
+# End of peak_rss()
+
+
+def format_bytes(size: Optional[int], sign: bool = False) -> str:
+    """Bytes -> human readable size, like 1.5 MiB."""
+
+    if size is None:
+        return "n/a"
+
+    text = f"{size:+,}" if sign else f"{size:,}"
+    for unit in ("KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+        text = f"{size:+.1f} {unit}" if sign else f"{size:.1f} {unit}"
+
+    return text if text.endswith("iB") else text + " B"
+# End of format_bytes()
+
+
+@dataclass(slots=True)
+class RefreshMemory:
+    """Memory measurements of a refresh."""
+
+    started: float  # Unix time
+    seconds: float
+    rss_before: Optional[int]
+    rss_after: Optional[int]
+    peak_rss: Optional[int]  # Of the process, as of end of refresh
+    traced_before: Optional[int]  # None if not tracing
+    traced_after: Optional[int]
+    traced_peak: Optional[int]  # Highest traced memory during the refresh
+
+    @property
+    def retained(self) -> Optional[int]:
+        """Memory in use before the refresh, i.e. kept from earlier ones."""
+        return (self.traced_before if self.traced_before is not None
+                else self.rss_before)
+# End of RefreshMemory class
+
+
+class MemoryMonitor:
+    """
+    Measure memory used by each refresh (RSS, and allocations if tracing),
+    and watch the memory retained between refreshes for steady growth.
+    """
+
+    def __init__(self, *, trace: bool = TRACE_ALLOCATIONS) -> None:
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.refreshes: deque[RefreshMemory] = deque(maxlen=REFRESHES_KEPT)
+        self._started: Optional[tuple[float, float, Optional[int],
+                                      Optional[int]]] = None
+
+    def refresh_started(self) -> None:
+        """Note the memory in use as a refresh starts."""
+
+        traced = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+
+        self._started = (time.time(), time.perf_counter(), current_rss(),
+                         traced)
+
+    def refresh_finished(self) -> None:
+        """Record the measurements of the refresh which was started."""
+
+        if self._started is None:
+            return
+
+        started, start_counter, rss_before, traced_before = self._started
+        self._started = None
+
+        traced_after = traced_peak = None
+        if tracemalloc.is_tracing() and traced_before is not None:
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+
+        self.refreshes.append(RefreshMemory(
+            started=started,
+            seconds=time.perf_counter() - start_counter,
+            rss_before=rss_before,
+            rss_after=current_rss(),
+            peak_rss=peak_rss(),
+            traced_before=traced_before,
+            traced_after=traced_after,
+            traced_peak=traced_peak
+        ))
+
+    def possible_leak(self) -> Optional[str]:
+        """Describe the growth if retained memory keeps growing, else None."""
+
+        retained = [refresh.retained for refresh in self.refreshes]
+        retained = retained[-(LEAK_STREAK + 1):]
+
+        if len(retained) <= LEAK_STREAK or None in retained:
+            return None
+
+        growing = all(before < after
+                      for before, after in zip(retained, retained[1:]))
+        growth = retained[-1] - retained[0]
+
+        if not growing or growth < LEAK_MIN_GROWTH:
+            return None
+
+        return (f"memory retained between refreshes grew at each of the "
+                f"last {LEAK_STREAK} refreshes ({format_bytes(growth, True)})")
+# End of MemoryMonitor class
+
+
+def get_memory_monitor(self) -> MemoryMonitor:
+    """Get the memory monitor of the cog, making it if needed."""
+
+    if not hasattr(self, "covid_memory_monitor"):
+        self.covid_memory_monitor = MemoryMonitor()
+
+    return self.covid_memory_monitor
+# End of get_memory_monitor()
+
+
+def memory_report(self, refreshes: int = 5) -> str:
+    """Make a report of memory used by the cog's data and refreshes."""
+
+    monitor = get_memory_monitor(self)
+    lines = ["Structures (deep size; shared objects counted once, in the "
+             "first one having them):"]
+
+    seen: set[int] = set()
+    total = reachable_records = 0
+
+    for path in STRUCTURES:
+        obj = self
+        for name in path.split("."):
+            obj = getattr(obj, name, None)
+        if obj is None:
+            continue
+
+        size, records = deep_size(obj, seen)
+        total += size
+        reachable_records += records
+
+        count = f"{len(obj):>6} items" if hasattr(obj, "__len__") else " " * 12
+        lines.append(f"  {path:<28}{count} {format_bytes(size):>10}")
+
+    lines.append(f"  {'total':<40} {format_bytes(total):>10}")
+
+    # Records which are alive but not in the above, are being kept by
+    # something else (like data of an older refresh not let go of)
+    alive_records = sum(isinstance(obj, Record) for obj in gc.get_objects())
+    lines.append(f"Records: {reachable_records} in data, "
+                 f"{alive_records} alive")
+
+    tracing = "off"
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        tracing = (f"current {format_bytes(current)}, "
+                   f"peak {format_bytes(peak)}")
+    lines.append(f"Process: RSS {format_bytes(current_rss())}, peak RSS "
+                 f"{format_bytes(peak_rss())}, tracemalloc {tracing}")
+
+    if monitor.refreshes:
+        lines.append(f"Last refreshes (of {len(monitor.refreshes)} kept):")
+
+    for refresh in list(monitor.refreshes)[-refreshes:]:
+        line = (time.strftime("  %d %b %H:%M:%S", time.localtime(
+                    refresh.started))
+                + f"  {refresh.seconds:6.2f} s  RSS "
+                + format_bytes(refresh.rss_after))
+
+        if None not in (refresh.rss_before, refresh.rss_after):
+            line += (" (" + format_bytes(refresh.rss_after
+                                         - refresh.rss_before, True) + ")")
+
+        if refresh.traced_before is not None:
+            line += (", traced "
+                     + format_bytes(refresh.traced_after
+                                    - refresh.traced_before, True)
+                     + " (peak "
+                     + format_bytes(refresh.traced_peak
+                                    - refresh.traced_before, True) + ")")
+
+        lines.append(line)
+
+    if leak := monitor.possible_leak():
+        lines.append("Possible leak: " + leak)
+
+    return "\n".join(lines)
+# End of memory_report()
+
+
+# End of file
@@ -0,0 +1,240 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+import asyncio
+from collections import deque
+import time
+from typing import Hashable
+
+# Import discord.py stuff
+import discord
+from discord.ext import commands
+
+
+# Time (in seconds) for which identical queries in a channel are collected
+COALESCE_WINDOW = 0.75
+
+# Discord allows 5 messages per 5 seconds in a channel for bots
+CHANNEL_RATE = 5
+CHANNEL_PER = 5.0
+
+
+class ResponseCoalescer:
+    """
+    Collect identical queries made in a channel within a short window, and
+    answer all of them with a single message. Messages are sent keeping the
+    per-channel rate limit in mind, so that bursts don't end up in 429s.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: float = COALESCE_WINDOW,
+        rate: int = CHANNEL_RATE,
+        per: float = CHANNEL_PER
+    ) -> None:
+        self.window = window
+        self.rate = rate
+        self.per = per
+
+        # (channel id, query key) -> (time of first query, contexts of
+        #                             everyone who asked for it)
+        self._pending: dict[
+            tuple[int, Hashable], tuple[float, list[commands.Context]]
+        ] = {}
+
+        # channel id -> times of the recent sends in that channel
+        self._sent: dict[int, deque[float]] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._last_prune = time.monotonic()
+
+        # Metrics
+        self.requests = 0  # Queries submitted
+        self.responses = 0  # Messages actually sent
+        self.queue_depth = 0  # Sends currently waiting for the rate limit
+        self.max_queue_depth = 0
+
+    def claim(self, ctx: commands.Context, key: Hashable) -> bool:
+        """
+        Register ctx's query. Returns True if ctx is the first one to ask for
+        it (and so should make the reply), False if ctx will be answered along
+        with an identical query made earlier.
+        """
+
+        self.requests += 1
+
+        if ctx.interaction is not None:  # Slash commands need own responses
+            return True
+
+        pending_key = (ctx.channel.id, key)
+        now = time.monotonic()
+
+        # Someone asked the same just now (and their reply didn't fail midway)
+        if (
+            pending_key in self._pending
+            and now - self._pending[pending_key][0] < 10 * self.window
+        ):
+            self._pending[pending_key][1].append(ctx)
+            return False
+
+        self._pending[pending_key] = (now, [ctx])
+        return True
+
+    async def release(
+        self,
+        ctx: commands.Context,
+        key: Hashable,
+        embed: discord.Embed
+    ) -> None:
+        """Reply to everyone who made ctx's query, once the window is over."""
+
+        if ctx.interaction is not None:  # Never merged, see claim()
+            await self.send(ctx, embed=embed)
+            return
+
+        pending_key = (ctx.channel.id, key)
+        claimed_at = self._pending.get(pending_key, (0.0, None))[0]
+
+        # Making the embed took some of the window already
+        try:
+            if (wait := claimed_at + self.window - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+        finally:  # Even if cancelled, so that later queries aren't merged
+            requesters = self._pending.pop(pending_key, (0.0, [ctx]))[1]
+
+        await self.send(ctx, embed=embed, requesters=requesters)
+
+    async def abandon(
+        self,
+        ctx: commands.Context,
+        key: Hashable,
+        error: discord.Embed
+    ) -> None:
+        """
+        Forget ctx's query if its reply couldn't be made, so that identical
+        queries made after this get answered on their own. Those whose query
+        was merged with ctx's are sent error instead of the reply.
+        """
+
+        if ctx.interaction is not None:  # Never merged, see claim()
+            return
+
+        requesters = self._pending.pop((ctx.channel.id, key), (0.0, []))[1]
+        others = [requester for requester in requesters
+                  if requester is not ctx]
+
+        if others:
+            await self.send(others[0], embed=error, requesters=others)
+
+    def _prune(self, now: float) -> None:
+        """Forget channels with no recent sends (at most once per period)."""
+
+        if now - self._last_prune < self.per:
+            return
+        self._last_prune = now
+
+        for channel_id, sent in list(self._sent.items()):
+            lock = self._locks.get(channel_id)
+            if (
+                (not sent or sent[-1] + self.per < now)
+                and (lock is None or not lock.locked())
+            ):
+                del self._sent[channel_id]
+                self._locks.pop(channel_id, None)
+
+    async def send(
+        self,
+        ctx: commands.Context,
+        *,
+        embed: discord.Embed,
+        requesters: list[commands.Context] = None
+    ) -> None:
+        """Send embed in ctx's channel, waiting out the channel rate limit."""
+
+        # Interaction responses are webhook followups, which don't count
+        # towards the channel's message rate limit
+        if ctx.interaction is not None:
+            await ctx.send(embed=embed)
+            self.responses += 1
+            return
+
+        channel_id = ctx.channel.id
+        self._prune(time.monotonic())
+
+        sent = self._sent.setdefault(channel_id, deque(maxlen=self.rate))
+        lock = self._locks.setdefault(channel_id, asyncio.Lock())
+
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        try:
+            async with lock:  # One send at a time per channel
+                if len(sent) == self.rate:  # Wait till the oldest send expires
+                    wait = sent[0] + self.per - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+
+                sent.append(time.monotonic())
+
+                if requesters is None or len(requesters) == 1:
+                    await ctx.send(embed=embed)
+                else:  # Reply to the first one, and mention the others
+                    others = dict.fromkeys(c.author.mention
+                                           for c in requesters[1:])
+                    others.pop(ctx.author.mention, None)
+                    await ctx.send(
+                        content=" ".join(others) or None, embed=embed,
+                        reference=ctx.message, mention_author=True
+                    )
+
+                self.responses += 1
+        finally:
+            self.queue_depth -= 1
+
+    def metrics(self) -> dict[str, float]:
+        """Coalescing and send queue statistics since the cog was loaded."""
+
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "coalescing_ratio": (self.requests / self.responses
+                                 if self.responses else 1.0),
+            "pending_queries": len(self._pending),
+            "channels_tracked": len(self._sent),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+# End of ResponseCoalescer class
+
+
+def get_coalescer(self) -> ResponseCoalescer:
+    """Get the coalescer of the cog, making one if it doesn't exist."""
+
+    if not hasattr(self, "covid_coalescer"):
+        self.covid_coalescer = ResponseCoalescer()
+
+    return self.covid_coalescer
+# End of get_coalescer()
+
+
+# End of file
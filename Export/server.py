@@ -0,0 +1,268 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+import asyncio
+from dataclasses import dataclass
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+# Import helper function and record type
+from ..Format.json_decode import encode_json
+from ..Format.records import DistrictStats
+
+
+# The export endpoint is enabled only if a port is given. With shared
+# snapshots, only the fetcher process serves it (readers would all try to
+# bind the same port).
+EXPORT_HOST = os.environ.get("COVID_EXPORT_HOST", "127.0.0.1")
+EXPORT_PORT = os.environ.get("COVID_EXPORT_PORT")
+
+START_TIMEOUT = 10  # Seconds to wait for the server to start listening
+
+
+@dataclass(slots=True, frozen=True)
+class ExportBody:
+    """
+    A response body, serialized and compressed once per refresh. Each
+    encoding has its own ETag, since their bytes differ.
+    """
+
+    plain: bytes
+    compressed: bytes
+    etag: str
+    compressed_etag: str
+
+    @classmethod
+    def from_data(cls, data: Any) -> "ExportBody":
+        plain = encode_json(data)
+        digest = hashlib.blake2b(plain, digest_size=16).hexdigest()
+        return cls(plain, gzip.compress(plain, 6),
+                   f'"{digest}"', f'"{digest}-gzip"')
+# End of ExportBody class
+
+
+def build_export_bodies(self) -> dict[str, ExportBody]:
+    """
+    Make bodies of every path served by the endpoint from the cog's data:
+        /covid                       -> Everything
+        /covid/state/<code>          -> State's cases, tests and vaccination
+        /covid/district/<code>/<name> -> District's cases
+    """
+
+    def as_dict(record: Any) -> Optional[dict[str, Any]]:
+        return None if record is None else record.as_dict()
+
+    states = {}
+    for state, state_stats in self.covid_state_stats.items():
+        states[state_stats.state_code] = {
+            "cases": state_stats.as_dict(),
+            "tests": as_dict(self.covid_test_stats.get(state)),
+            "vaccination": as_dict(self.covid_vaccination_stats.get(state)),
+        }
+
+    districts = {}
+    for district, district_stats in self.covid_district_stats.items():
+        if isinstance(district_stats, DistrictStats):  # Unique across India
+            district_list = [district_stats]
+        else:  # Same district name in multiple states
+            district_list = district_stats.values()
+
+        for district_stat in district_list:
+            districts.setdefault(district_stat.state_code, {})[district] = (
+                district_stat.as_dict()
+            )
+
+    bodies = {
+        "/covid": ExportBody.from_data({
+            "last_fetched": self.covid_last_fetched.isoformat(),
+            "states": states,
+            "districts": districts,
+        })
+    }
+
+    for state_code, state_data in states.items():
+        bodies[f"/covid/state/{state_code}"] = ExportBody.from_data(
+            state_data
+        )
+
+    for state_code, state_districts in districts.items():
+        for district, district_data in state_districts.items():
+            path = f"/covid/district/{state_code}/{district}"
+            bodies[path] = ExportBody.from_data(district_data)
+
+    return bodies
+# End of build_export_bodies()
+
+
+class ExportServer:
+    """
+    Read-only HTTP server for the parsed data, running its own event loop in
+    a separate thread so that requests to it never wait on (or hold up) the
+    bot's event loop. Serving is just a dict lookup of a ready body.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.bodies: dict[str, ExportBody] = {}  # Replaced as a whole
+        self.requests = 0
+        self.not_modified = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        body = self.bodies.get(request.path)
+
+        if body is None:
+            raise web.HTTPNotFound()
+
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding",
+                   "Content-Type": "application/json"}
+
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            etag, content = body.compressed_etag, body.compressed
+        else:
+            etag, content = body.etag, body.plain
+
+        headers["ETag"] = etag
+
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        if content is body.compressed:
+            headers["Content-Encoding"] = "gzip"
+
+        return web.Response(body=content, headers=headers)
+
+    def start(self) -> None:
+        """
+        Start serving in a new (daemon) thread. Blocks till it's listening,
+        so call it in another thread. Raises what stopped it from starting
+        (like OSError if the port is in use), or TimeoutError.
+        """
+
+        from aiohttp import web
+
+        started = threading.Event()
+        failure: list[BaseException] = []
+
+        async def serve() -> None:
+            app = web.Application()
+            app.router.add_get("/{path:.*}", self._handle)
+
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self.host, self.port).start()
+
+        def run() -> None:
+            loop = asyncio.new_event_loop()
+
+            try:
+                loop.run_until_complete(serve())
+                self._loop = loop
+            except BaseException as error:  # Let start() raise it
+                failure.append(error)
+                if self._runner is not None:
+                    loop.run_until_complete(self._runner.cleanup())
+                loop.close()
+                return
+            finally:  # Never leave start() waiting
+                started.set()
+
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="covid-export",
+                                        daemon=True)
+        self._thread.start()
+
+        if not started.wait(START_TIMEOUT):
+            raise TimeoutError(f"Export server didn't start in "
+                               f"{START_TIMEOUT} seconds")
+        if failure:
+            raise failure[0]
+
+    def stop(self) -> None:
+        """Stop the server and its thread."""
+
+        if self._loop is None:
+            return
+
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(),
+                                                  self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+# End of ExportServer class
+
+
+async def refresh_export(self) -> None:
+    """
+    Serve the current data at the export endpoint (if enabled), starting it
+    if needed. Bodies are made in another thread to keep the bot responsive.
+    Called only by the process which fetches the data.
+    """
+
+    port = getattr(self, "covid_export_port", EXPORT_PORT)
+    if port is None:
+        return
+
+    bodies = await asyncio.to_thread(build_export_bodies, self)
+
+    if getattr(self, "covid_export_server", None) is None:
+        server = ExportServer(EXPORT_HOST, int(port))
+
+        try:  # Tried again at next refresh if it fails
+            await asyncio.to_thread(server.start)
+        except (OSError, TimeoutError):
+            logging.exception("Couldn't start export endpoint at %s:%s",
+                              EXPORT_HOST, port)
+            return
+
+        self.covid_export_server = server
+
+    self.covid_export_server.bodies = bodies
+# End of refresh_export()
+
+
+def stop_export_server(self) -> None:
+    """Stop the export endpoint. Call this when unloading the cog."""
+
+    if (server := getattr(self, "covid_export_server", None)) is not None:
+        server.stop()
+        self.covid_export_server = None
+# End of stop_export_server()
+
+
+# End of file
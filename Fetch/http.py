@@ -0,0 +1,125 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+import asyncio
+import importlib.util
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # aiohttp is imported only when the session is made
+    import aiohttp
+
+# Import helper constant
+from .schedule import MIN_INTERVAL
+
+
+# Connection pool limits (all feeds are on a single host)
+CONNECTION_LIMIT = 10
+CONNECTION_LIMIT_PER_HOST = 6
+
+# Seconds to keep idle connections around: a little longer than the gap
+# between polls while feeds are polled most often (around their publish
+# times). They're reused only if the server keeps them open that long too.
+KEEPALIVE_TIMEOUT = MIN_INTERVAL + 60
+
+# Seconds to keep DNS results around
+DNS_CACHE_TTL = 30 * 60
+
+# Give up on a refresh if the feeds take longer than this (in seconds)
+FETCH_TIMEOUT = 5 * 60
+
+
+def accept_encoding() -> str:
+    """Encodings to ask for; aiohttp can decode brotli only if it's there."""
+
+    if (
+        importlib.util.find_spec("brotli") is not None
+        or importlib.util.find_spec("brotlicffi") is not None
+    ):
+        return "br, gzip, deflate"
+
+    return "gzip, deflate"
+# End of accept_encoding()
+
+
+def get_http_session(self) -> "aiohttp.ClientSession":
+    """
+    Get the HTTP session of the cog, which is kept across refreshes so that
+    connections and DNS lookups are reused. Made on first use.
+    """
+
+    import aiohttp
+
+    session = getattr(self, "covid_http_session", None)
+
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Accept-Encoding": accept_encoding()},
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT),
+            raise_for_status=True,
+        )
+        self.covid_http_session = session
+
+    return session
+# End of get_http_session()
+
+
+async def close_http_session(self) -> None:
+    """Close the HTTP session of the cog. Call this when unloading the cog."""
+
+    session = getattr(self, "covid_http_session", None)
+
+    if session is not None and not session.closed:
+        await session.close()
+
+    self.covid_http_session = None
+# End of close_http_session()
+
+
+async def fetch_feed(session: "aiohttp.ClientSession", url: str) -> bytes:
+    """Get the (decompressed) body of a feed."""
+
+    async with session.get(url) as resp:
+        return await resp.read()
+# End of fetch_feed()
+
+
+async def fetch_feeds(
+    session: "aiohttp.ClientSession",
+    urls: dict[str, str]
+) -> dict[str, bytes]:
+    """Get the bodies of several feeds together (feed name -> url)."""
+
+    bodies = await asyncio.gather(*(fetch_feed(session, url)
+                                    for url in urls.values()))
+    return dict(zip(urls, bodies))
+# End of fetch_feeds()
+
+
+# End of file
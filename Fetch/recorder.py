@@ -0,0 +1,128 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+from typing import Iterator, Optional
+
+# Import helper functions
+from ..Format.json_decode import decode_json, encode_json
+
+
+# Set COVID_RECORD_PATH to a directory to archive every fetched feed body
+# there (for replaying later, see Benchmarks/replay.py). Not set means
+# nothing is recorded.
+RECORD_PATH = os.environ.get("COVID_RECORD_PATH")
+
+
+class FeedArchive:
+    """
+    Archive of polled feed bodies. Bodies are stored (gzipped) once under
+    bodies/ named by their hash, so a feed which hasn't changed costs only a
+    line in index.jsonl, which has the time and body hashes of each poll.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.bodies_path = os.path.join(path, "bodies")
+        self.index_path = os.path.join(path, "index.jsonl")
+
+        os.makedirs(self.bodies_path, exist_ok=True)
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.bodies_path, digest + ".gz")
+
+    def add(self, fetched: dict[str, bytes], when: float = None) -> int:
+        """Archive a poll of feeds; returns number of new bodies stored."""
+
+        when = time.time() if when is None else when
+        hashes, stored = {}, 0
+
+        for name, body in fetched.items():
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+            hashes[name] = digest
+
+            body_path = self._body_path(digest)
+            if os.path.exists(body_path):  # Seen before
+                continue
+
+            # Written to a temporary file first, so that a crash doesn't
+            # leave a partial body that would be taken as the real one
+            with open(body_path + ".tmp", "wb") as f:
+                f.write(gzip.compress(body, 6))
+            os.replace(body_path + ".tmp", body_path)
+            stored += 1
+
+        with open(self.index_path, "ab") as f:
+            f.write(encode_json({"time": when, "feeds": hashes}) + b"\n")
+
+        return stored
+
+    def polls(self) -> Iterator[tuple[float, dict[str, str]]]:
+        """(time, feed name -> body hash) of each poll, oldest first."""
+
+        try:
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        poll = decode_json(line)
+                        yield poll["time"], poll["feeds"]
+        except FileNotFoundError:  # Nothing recorded yet
+            return
+
+    def body(self, digest: str) -> bytes:
+        """Body having the given hash."""
+
+        with open(self._body_path(digest), "rb") as f:
+            return gzip.decompress(f.read())
+# End of FeedArchive class
+
+
+def get_feed_archive(self) -> Optional[FeedArchive]:
+    """Get the feed archive of the cog if recording is enabled."""
+
+    path = getattr(self, "covid_record_path", RECORD_PATH)
+    if path is None:
+        return None
+
+    archive = getattr(self, "covid_feed_archive", None)
+    if archive is None or archive.path != path:
+        archive = self.covid_feed_archive = FeedArchive(path)
+
+    return archive
+# End of get_feed_archive()
+
+
+async def record_feeds(self, fetched: dict[str, bytes]) -> None:
+    """Archive fetched feeds (if enabled), writing in another thread."""
+
+    archive = get_feed_archive(self)
+    if archive is not None and fetched:
+        await asyncio.to_thread(archive.add, fetched, time.time())
+# End of record_feeds()
+
+
+# End of file
@@ -0,0 +1,184 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from collections import deque
+from dataclasses import dataclass, field
+import hashlib
+import math
+import time
+from typing import Iterable, Optional
+
+
+# Polling intervals (in seconds)
+MIN_INTERVAL = 5 * 60  # Right after a change, and around usual publish times
+DEFAULT_INTERVAL = 15 * 60  # What the fixed loop used to poll at
+MAX_INTERVAL = 24 * 60 * 60  # For feeds which haven't changed in ages
+
+# How close (in seconds) to a usual publish time polling speeds up
+PUBLISH_WINDOW = 30 * 60
+
+# Number of past changes remembered per feed, to learn publish times
+CHANGES_REMEMBERED = 14
+
+# Feeds due within this many seconds are polled along, since the update loop
+# may wake up a little before a feed is due
+DUE_SLACK = 30
+
+DAY = 24 * 60 * 60
+
+
+@dataclass(slots=True)
+class FeedSchedule:
+    """What has been observed about a feed, and when to poll it next."""
+
+    name: str
+    interval: float = DEFAULT_INTERVAL
+    next_due: float = 0.0  # Unix time; 0 means poll right away
+    last_hash: Optional[bytes] = None
+    last_change: Optional[float] = None
+    polls: int = 0
+    changes: int = 0
+
+    # Seconds since (UTC) midnight of the last few changes
+    change_times: deque = field(
+        default_factory=lambda: deque(maxlen=CHANGES_REMEMBERED)
+    )
+# End of FeedSchedule class
+
+
+class FeedScheduler:
+    """
+    Learn how often each feed changes (from hashes of its content), and poll
+    it accordingly: soon after a change, and around the times of day it
+    usually changes at, while backing off exponentially when it doesn't.
+    """
+
+    def __init__(self, feeds: Iterable[str]) -> None:
+        self.feeds = {name: FeedSchedule(name) for name in feeds}
+
+    def due(self, now: float = None) -> list[str]:
+        """Feeds which should be polled now."""
+
+        now = time.time() if now is None else now
+        return [name for name, feed in self.feeds.items()
+                if feed.next_due <= now]
+
+    def observe(self, name: str, body: bytes, now: float = None) -> bool:
+        """Record a poll of a feed, and return whether it had changed."""
+
+        now = time.time() if now is None else now
+        feed = self.feeds[name]
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+
+        changed = digest != feed.last_hash
+        feed.polls += 1
+
+        if changed:
+            if feed.last_hash is not None:  # Not the first poll
+                feed.changes += 1
+                feed.last_change = now
+                feed.change_times.append(now % DAY)
+
+            feed.last_hash = digest
+            feed.interval = MIN_INTERVAL
+        else:  # Back off, as it's probably not going to change soon
+            feed.interval = min(feed.interval * 2, MAX_INTERVAL)
+
+        feed.next_due = self._next_poll(feed, now)
+        return changed
+
+    def forget(self, names: Iterable[str]) -> None:
+        """Forget feeds' content, so that their next poll counts as changed."""
+
+        for name in names:
+            self.feeds[name].last_hash = None
+
+    def _next_poll(self, feed: FeedSchedule, now: float) -> float:
+        """Time to poll a feed next, considering its usual publish times."""
+
+        next_due = now + feed.interval
+
+        for change_time in feed.change_times:
+            # Start of the window around this publish time, today or later
+            window_start = (now - now % DAY) + change_time - PUBLISH_WINDOW
+            while window_start + 2 * PUBLISH_WINDOW < now:
+                window_start += DAY
+
+            if window_start <= now:  # Inside the window right now
+                next_due = min(next_due, now + MIN_INTERVAL)
+            elif window_start < next_due:  # Window starts before next poll
+                next_due = max(window_start, now + MIN_INTERVAL)
+
+        return next_due
+
+    def seconds_until(
+        self,
+        feeds: Iterable[str] = None,
+        now: float = None
+    ) -> float:
+        """Seconds till the next poll of any of the given (or all) feeds."""
+
+        now = time.time() if now is None else now
+        names = self.feeds if feeds is None else feeds
+
+        next_due = min(self.feeds[name].next_due for name in names)
+        return max(next_due - now, 0.0)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Per feed polling statistics, for the owner."""
+
+        now = time.time()
+        return {
+            name: {
+                "interval_min": feed.interval / 60,
+                "next_poll_in_min": max(feed.next_due - now, 0) / 60,
+                "polls": feed.polls,
+                "changes": feed.changes,
+            }
+            for name, feed in self.feeds.items()
+        }
+# End of FeedScheduler class
+
+
+def get_feed_scheduler(self, feeds: Iterable[str]) -> FeedScheduler:
+    """Get the feed scheduler of the cog, making one if it doesn't exist."""
+
+    if not hasattr(self, "covid_feed_scheduler"):
+        self.covid_feed_scheduler = FeedScheduler(feeds)
+
+    return self.covid_feed_scheduler
+# End of get_feed_scheduler()
+
+
+def minutes_until_refresh(self, feeds: Iterable[str] = None) -> int:
+    """Minutes (at least 1) till any of the given (or all) feeds is polled."""
+
+    next_refresh = self.covid_feed_next_refresh  # Also in shared snapshots
+    names = next_refresh if feeds is None else feeds
+
+    seconds = min(next_refresh[name] for name in names) - time.time()
+    return max(math.ceil(seconds / 60), 1)
+# End of minutes_until_refresh()
+
+
+# End of file
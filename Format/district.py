@@ -23,23 +23,26 @@
 # Import standard library dependencies
 import csv
 import pickle
-from typing import TextIO, Union
+from typing import Any, TextIO, Union
 
-# Import external dependencies
-import aiofiles
+# Import record types and helper function
+from .records import DistrictStats, parse_int
+from .state import parsed_json_stats
 
 
 async def format_district_stats(
     district_csv: TextIO
-) -> dict[str, dict[str, Union[dict[str, Union[int, str]], int, str]]]:
-    """Make dicts for each district containing the stats"""
+) -> dict[str, Union[DistrictStats, dict[str, DistrictStats]]]:
+    """Make records for each district containing the stats"""
     # We first create a dict of lists pertaining to each district name, so that
     # each value will be a list containing different dicts corresponding to the
     # states having district name under consideration.
-    # Then from the dict of lists, we will create a potential dict of dicts,
-    # with the inner data being the district data if district name is unique
+    # Then from the dict of lists, we will create a dict, with the value
+    # being the district record if district name is unique
     # across India, otherwise inner data will be labelled with keys pertaining
-    # to the state name and the value being the normal dict containing data
+    # to the state name and the value being the record containing data
+
+    import aiofiles  # Only needed while refreshing
 
     district_stats_list = {}
 
@@ -55,35 +58,44 @@ async def format_district_stats(
         if district not in district_stats_list:
             district_stats_list[district] = []
 
-        current_district_stats = {
-            "district": district,
+        current_district_stats = DistrictStats(
+            district=district,
 
-            "state": row["State"],
-            "state_code": row["State_Code"],
-            "district_key": row["District_Key"],
+            state=row["State"],
+            state_code=row["State_Code"],
+            district_key=row["District_Key"],
 
-            "confirmed": row["Confirmed"],
-            "active": row["Active"],
-            "recovered": row["Recovered"],
-            "deaths": row["Deceased"],
+            confirmed=parse_int(row["Confirmed"]),
+            active=parse_int(row["Active"]),
+            recovered=parse_int(row["Recovered"]),
+            deaths=parse_int(row["Deceased"]),
 
-            "new_cases": row["Delta_Confirmed"],
-            "new_active": row["Delta_Active"],
-            "new_recoveries": row["Delta_Recovered"],
-            "new_deaths": row["Delta_Deceased"],
+            new_cases=parse_int(row["Delta_Confirmed"]),
+            new_active=parse_int(row["Delta_Active"]),
+            new_recoveries=parse_int(row["Delta_Recovered"]),
+            new_deaths=parse_int(row["Delta_Deceased"]),
 
-            "notes": row["District_Notes"],
-            "last_updated": row["Last_Updated"],
-        }
+            notes=row["District_Notes"],
+            last_updated=row["Last_Updated"],
+        )
 
-        if (key := current_district_stats["district_key"]) in old_notes:
-            current_district_stats["notes"] = (
-                current_district_stats["notes"].removesuffix(old_notes[key])
+        if (key := current_district_stats.district_key) in old_notes:
+            current_district_stats.notes = (
+                current_district_stats.notes.removesuffix(old_notes[key])
             )
 
-        district_stats_list[district].append(current_district_stats.copy())
+        district_stats_list[district].append(current_district_stats)
+
+    return group_district_stats(district_stats_list)
+# End of format_district_stats()
+
+
+def group_district_stats(
+    district_stats_list: dict[str, list[DistrictStats]]
+) -> dict[str, Union[DistrictStats, dict[str, DistrictStats]]]:
+    """Key districts having the same name with their state names."""
 
-    district_stats_dict = {}
+    district_stats_dict = {}  # See format_district_stats() for the layout
 
     for district, district_list in district_stats_list.items():
         if len(district_list) == 1:  # Only one district with that name
@@ -92,12 +104,86 @@ async def format_district_stats(
         else:  # Multiple districts with same name
             state_dict = {}  # Store with key = state name
             for district_stat in district_list:
-                state_dict[district_stat["state"]] = district_stat
+                state_dict[district_stat.state] = district_stat
 
             district_stats_dict[district] = state_dict
 
     return district_stats_dict
-# End of format_district_stats()
+# End of group_district_stats()
+
+
+async def format_district_json_stats(
+    district_json: dict[str, dict[str, dict[str, Any]]],
+    state_json: dict[str, dict[str, Any]],
+    state_codes: dict[str, str]
+) -> dict[str, Union[DistrictStats, dict[str, DistrictStats]]]:
+    """
+    Make records for each district from v4/data.min.json (already trimmed by
+    extract_district_json()), so that district_wise.csv isn't needed.
+    """
+
+    import aiofiles  # Only needed while refreshing
+
+    district_stats_list = {}
+
+    path = "./Cogs/Utility/Covid/Format/Old_notes/district.pickle"
+    async with aiofiles.open(path, "rb") as f:
+        old_notes = pickle.loads(await f.read())
+
+    for state_code, districts in district_json.items():
+        if state_code not in state_codes:  # Can't name the state
+            continue
+
+        state = state_codes[state_code]
+
+        # Districts don't have their own dates, so the state's are used to
+        # decide whether the deltas are of today
+        state_meta = state_json.get(state_code, {}).get("meta", {})
+
+        for district, district_data in districts.items():
+            json_data = parsed_json_stats({
+                "total": district_data.get("total", {}),
+                "delta": district_data.get("delta", {}),
+                "meta": {
+                    **state_meta,
+                    "notes": district_data.get("meta", {}).get("notes", "")
+                }
+            })
+
+            current_district_stats = DistrictStats(
+                district=district,
+
+                state=state,
+                state_code=state_code,
+                district_key=f"{state_code}_{district}",
+
+                confirmed=json_data["confirmed"],
+                active=json_data["active"],
+                recovered=json_data["recovered"],
+                deaths=json_data["deaths"],
+
+                new_cases=json_data["new_cases"],
+                new_active=(json_data["new_cases"]
+                            - json_data["new_recoveries"]
+                            - json_data["new_deaths"]),
+                new_recoveries=json_data["new_recoveries"],
+                new_deaths=json_data["new_deaths"],
+
+                notes=json_data["notes"],
+                last_updated=json_data["last_updated"],
+            )
+
+            if (key := current_district_stats.district_key) in old_notes:
+                current_district_stats.notes = (
+                    current_district_stats.notes.removesuffix(old_notes[key])
+                )
+
+            district_stats_list.setdefault(district, []).append(
+                current_district_stats
+            )
+
+    return group_district_stats(district_stats_list)
+# End of format_district_json_stats()
 
 
 # End of file
@@ -0,0 +1,117 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+import json
+from typing import Any, Union
+
+# Import optional external dependencies
+try:  # Several times faster than json, but not needed
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Fields of v4/data.min.json used for a state (or district); others like
+# "delta7", "delta21_14", "tested" etc. are dropped while decoding
+FIELDS_NEEDED = ("total", "delta", "meta")
+
+
+def decode_json(body: Union[bytes, str]) -> Any:
+    """Decode json using orjson if installed, else the standard library."""
+
+    if orjson is not None:
+        return orjson.loads(body)
+
+    return json.loads(body)
+# End of decode_json()
+
+
+def encode_json(data: Any) -> bytes:
+    """Encode data as compact json, using orjson if installed."""
+
+    if orjson is not None:
+        return orjson.dumps(data)
+
+    return json.dumps(data, separators=(",", ":")).encode()
+# End of encode_json()
+
+
+def decode_data_json(
+    body: Union[bytes, str],
+    *,
+    districts: bool = False
+) -> dict[str, dict[str, Any]]:
+    """
+    Decode v4/data.min.json keeping only FIELDS_NEEDED of each state, and of
+    each of its districts (under "districts") if asked for. Other fields are
+    dropped as soon as their state or district is decoded, so the full tree
+    is never in memory at once. orjson has no hook to do this, so the
+    standard library is used.
+    """
+
+    fields = FIELDS_NEEDED + ("districts",) if districts else FIELDS_NEEDED
+
+    def keep_needed(obj: dict[str, Any]) -> dict[str, Any]:
+        if "total" in obj or "meta" in obj:  # A state or district
+            return {field: obj[field] for field in fields if field in obj}
+        return obj
+
+    return json.loads(body, object_hook=keep_needed)
+# End of decode_data_json()
+
+
+def extract_state_json(
+    data: dict[str, Any]
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """Keep only the fields of each state needed by format_state_stats()"""
+
+    return {
+        state_code: {
+            field: state_data[field]
+            for field in FIELDS_NEEDED if field in state_data
+        }
+        for state_code, state_data in data.items()
+    }
+# End of extract_state_json()
+
+
+def extract_district_json(
+    data: dict[str, Any]
+) -> dict[str, dict[str, dict[str, dict[str, Any]]]]:
+    """Keep only the needed fields of each district, under its state code."""
+
+    return {
+        state_code: {
+            district: {
+                field: district_data[field]
+                for field in FIELDS_NEEDED if field in district_data
+            }
+            for district, district_data in state_data["districts"].items()
+        }
+        for state_code, state_data in data.items()
+        if "districts" in state_data
+    }
+# End of extract_district_json()
+
+
+# End of file
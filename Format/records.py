@@ -0,0 +1,136 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, Optional, Union
+
+
+def parse_int(value: Union[int, float, str, None]) -> int:
+    """Parse a number from csv (may be an empty string) or json."""
+
+    if value is None or value == "":
+        return 0
+
+    try:
+        return int(value)
+    except ValueError:  # Strings like "1.0"
+        return int(float(value))
+# End of parse_int()
+
+
+class Record:
+    """
+    Base for the stats records, giving them a read-only dict like view so that
+    code using `stats["confirmed"]` keeps working. Use attributes where speed
+    matters, since they skip the extra method call.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__dataclass_fields__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__dataclass_fields__)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self else default
+
+    def keys(self) -> list[str]:
+        return list(self.__dataclass_fields__)
+
+    def items(self) -> list[tuple[str, Any]]:
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+# End of Record class
+
+
+@dataclass(slots=True)
+class StateStats(Record):
+    """Case statistics of a state/UT (or India, with state "Total")."""
+
+    state: str
+    state_code: str
+
+    confirmed: int
+    recovered: int
+    deaths: int
+    active: int
+
+    new_cases: int
+    new_recoveries: int
+    new_deaths: int
+
+    last_updated: str
+    notes: str
+# End of StateStats class
+
+
+@dataclass(slots=True)
+class DistrictStats(Record):
+    """Case statistics of a district."""
+
+    district: str
+
+    state: str
+    state_code: str
+    district_key: str
+
+    confirmed: int
+    active: int
+    recovered: int
+    deaths: int
+
+    new_cases: int
+    new_active: int
+    new_recoveries: int
+    new_deaths: int
+
+    notes: str
+    last_updated: str
+# End of DistrictStats class
+
+
+@dataclass(slots=True)
+class TimeseriesStat(Record):
+    """Latest value of a statistic (tests, doses, etc.) of a state/UT."""
+
+    date: str
+    total: int
+    today: Optional[int]  # None if increase since last report isn't known
+    source: Optional[str]
+
+    # Other statistics reported along (like first/second doses), with name ->
+    # (total, increase), either being None if not known
+    breakdown: Optional[dict[str, tuple[Optional[int], Optional[int]]]] = None
+# End of TimeseriesStat class
+
+
+# End of file
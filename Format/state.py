@@ -26,8 +26,8 @@ from datetime import datetime
 import pickle
 from typing import Any, TextIO, Union
 
-# Import external dependencies
-import aiofiles
+# Import record types
+from .records import StateStats, parse_int
 
 
 def parsed_json_stats(json: dict[str, Any]) -> dict[str, Union[int, str]]:
@@ -91,8 +91,10 @@ def parsed_json_stats(json: dict[str, Any]) -> dict[str, Union[int, str]]:
 async def format_state_stats(
     state_csv: TextIO,
     state_json: dict[str, Any]
-) -> dict[str, dict[str, Union[int, str]]]:
-    """Make dicts for each state containing the stats"""
+) -> dict[str, StateStats]:
+    """Make records for each state containing the stats"""
+
+    import aiofiles  # Only needed while refreshing
 
     state_stats = {}
 
@@ -110,50 +112,49 @@ async def format_state_stats(
         else:
             json_data = None  # Use outdated data rather than having no data
 
-        state_stats[state] = {
-            "state": state,
-            "state_code": state_code,
-
-            # Use data from json instead of csv since csv isn't updated as of
-            # 19th August, 2021 12:00:00 IST.
-
-            # "confirmed": row["Confirmed"],
-            # "recovered": row["Recovered"],
-            # "deaths": row["Deaths"],
-            # "active": row["Active"],
-
-            # "new_cases": row["Delta_Confirmed"],
-            # "new_recoveries": row["Delta_Recovered"],
-            # "new_deaths": row["Delta_Deaths"],
-
-            # "last_updated": row["Last_Updated_Time"],
-            # "notes": row["State_Notes"]
-
-            "confirmed": (json_data["confirmed"] if json_data is not None
-                          else row["Confirmed"]),  # row has csv data
-            "recovered": (json_data["recovered"] if json_data is not None
-                          else row["Recovered"]),
-            "deaths": (json_data["deaths"] if json_data is not None
-                       else row["Deaths"]),
-            "active": (json_data["active"] if json_data is not None
-                       else row["Active"]),
-
-            "new_cases": (json_data["new_cases"] if json_data is not None
-                          else row["Delta_Confirmed"]),
-            "new_recoveries": (row["Delta_Recovered"] if json_data is None
-                               else json_data["new_recoveries"]),
-            "new_deaths": (json_data["new_deaths"] if json_data is not None
-                           else row["Delta_Deaths"]),
-
-            "last_updated": (json_data["last_updated"] if json_data is not None
-                             else row["Last_Updated_Time"]),
-            "notes": (json_data["notes"] if json_data is not None
-                      else row["State_Notes"]),
-        }
+        # Use data from json instead of csv since csv isn't updated as of
+        # 19th August, 2021 12:00:00 IST. Numbers in csv are strings, so
+        # parse them here once rather than on every command.
+
+        if json_data is not None:
+            state_stats[state] = StateStats(
+                state=state,
+                state_code=state_code,
+
+                confirmed=json_data["confirmed"],
+                recovered=json_data["recovered"],
+                deaths=json_data["deaths"],
+                active=json_data["active"],
+
+                new_cases=json_data["new_cases"],
+                new_recoveries=json_data["new_recoveries"],
+                new_deaths=json_data["new_deaths"],
+
+                last_updated=json_data["last_updated"],
+                notes=json_data["notes"],
+            )
+
+        else:  # row has (outdated) csv data
+            state_stats[state] = StateStats(
+                state=state,
+                state_code=state_code,
+
+                confirmed=parse_int(row["Confirmed"]),
+                recovered=parse_int(row["Recovered"]),
+                deaths=parse_int(row["Deaths"]),
+                active=parse_int(row["Active"]),
+
+                new_cases=parse_int(row["Delta_Confirmed"]),
+                new_recoveries=parse_int(row["Delta_Recovered"]),
+                new_deaths=parse_int(row["Delta_Deaths"]),
+
+                last_updated=row["Last_Updated_Time"],
+                notes=row["State_Notes"],
+            )
 
         if state in old_notes:
-            state_stats[state]["notes"] = (
-                state_stats[state]["notes"].removesuffix(old_notes[state])
+            state_stats[state].notes = (
+                state_stats[state].notes.removesuffix(old_notes[state])
             )
 
     return state_stats
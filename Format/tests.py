@@ -21,20 +21,20 @@
 
 
 # Import standard library dependencies
-from typing import TextIO, Union
+from typing import TextIO
 
-# Import external dependencies
-import pandas as pd
-
-# Import helper function
+# Import helper function and record type
+from .records import TimeseriesStat
 from .timeseries_statewise import format_state_timeseries
 
 
 def format_test_stats(
     tests_csv: TextIO,
     icmr_csv: TextIO
-) -> dict[str, dict[str, Union[int, str]]]:
-    """Make dicts for each state containing testing stats"""
+) -> dict[str, TimeseriesStat]:
+    """Make records for each state containing testing stats"""
+
+    import pandas as pd  # Heavy, so loaded on first refresh (not cog load)
 
     # First store state statistics, and then add national stats later
     test_stats = format_state_timeseries(
@@ -61,12 +61,15 @@ def format_test_stats(
         icmr_df["Source"].first_valid_index()
     ])
 
-    test_stats["Total"] = {
-        "date": icmr_df.iloc[first_index]["Tested As Of"].strftime("%d/%m/%Y"),
-        "total": icmr_df.iloc[first_index]["Total Samples Tested"],
-        "today": icmr_df.iloc[first_index]["Sample Reported today"],
-        "source": icmr_df.iloc[first_index]["Source"]
-    }
+    national_row = icmr_df.iloc[first_index]
+    tested_today = national_row["Sample Reported today"]
+
+    test_stats["Total"] = TimeseriesStat(
+        date=national_row["Tested As Of"].strftime("%d/%m/%Y"),
+        total=int(national_row["Total Samples Tested"]),
+        today=None if pd.isnull(tested_today) else int(tested_today),
+        source=national_row["Source"]
+    )
 
     # Both state and national stats are now added in the dict
     return test_stats
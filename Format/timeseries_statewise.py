@@ -21,10 +21,10 @@
 
 
 # Import standard library dependencies
-from typing import TextIO, Union
+from typing import TextIO
 
-# Import external dependencies
-import pandas as pd
+# Import record types
+from .records import TimeseriesStat
 
 
 def format_state_timeseries(
@@ -32,54 +32,109 @@ def format_state_timeseries(
     statistics_csv: TextIO,
     date_field: str,
     statistic_required: str,
-    source_field: str = None
-) -> dict[str, dict[str, Union[int, str]]]:
+    source_field: str = None,
+    breakdown_fields: dict[str, str] = None
+) -> dict[str, TimeseriesStat]:
     """
-    Make dicts for each state with csv containing the stats in timeseries.
+    Make records for each state with csv containing the stats in timeseries.
     That is, every row of CSV has data for a particular date and state.
+    breakdown_fields (name -> column) are other columns to get from the same
+    rows as statistic_required, along with their increase.
     """
-    columns_needed = ["State", date_field, statistic_required]
-    if source_field is not None:
-        columns_needed.append(source_field)
-
-    statistics_csv.seek(0)
-    statistics_df = pd.read_csv(statistics_csv, parse_dates=[date_field],
-                                dayfirst=True, usecols=columns_needed)
-
-    # Sort by dates descending
-    statistics_df.sort_values(by=[date_field], ascending=False, inplace=True)
-
-    statistics = {}
-
-    for state in statistics_df["State"].unique():
-        state_df = statistics_df[statistics_df["State"] == state]
-        state_df.reset_index(drop=True, inplace=True)  # Top row = 0 index etc.
 
-        first_index = state_df[statistic_required].first_valid_index()
+    # pandas takes a good part of a second to import, and isn't needed till
+    # the data is fetched, so it isn't imported at the top
+    import numpy as np
+    import pandas as pd
 
-        if isinstance(first_index, int):
-            next_index = first_index + 1
+    breakdown_fields = breakdown_fields or {}
 
-            date_total = state_df.iloc[first_index][date_field]
-            stats_total = int(state_df.iloc[first_index][statistic_required])
-            stats_prev = state_df.iloc[next_index][statistic_required]
+    columns_needed = {"State", date_field, statistic_required,
+                      *breakdown_fields.values()}
+    if source_field is not None:
+        columns_needed.add(source_field)
 
-            if pd.isnull(stats_prev):
-                stats_today = ""
-            else:
-                stats_today = stats_total - int(stats_prev)
+    # Columns not in csv are skipped, and headers are matched stripped since
+    # they have had stray spaces at times
+    statistics_csv.seek(0)
+    statistics_df = pd.read_csv(
+        statistics_csv,
+        usecols=lambda column: column.strip() in columns_needed
+    )
+    statistics_df.columns = statistics_df.columns.str.strip()
+
+    # Parsed after stripping, as the date header may have spaces too
+    statistics_df[date_field] = pd.to_datetime(statistics_df[date_field],
+                                               dayfirst=True)
+
+    # Rows of each state together, with dates descending within a state
+    statistics_df.sort_values(by=[date_field], ascending=False, kind="stable",
+                              inplace=True)
+    statistics_df.sort_values(by=["State"], kind="stable", inplace=True,
+                              ignore_index=True)
+
+    # Latest row having the statistic for each state, and the row after it
+    # (previous report) if it's of the same state
+    latest_df = statistics_df[statistics_df[statistic_required].notna()]
+    latest_df = latest_df.drop_duplicates(subset=["State"])
+
+    latest_index = latest_df.index.to_numpy()
+    next_index = latest_index + 1
+    has_next = next_index < len(statistics_df)
+    next_index[~has_next] = latest_index[~has_next]  # Masked out below
+
+    states = statistics_df["State"].to_numpy()
+    has_previous = has_next & (states[next_index] == states[latest_index])
+
+    def latest_and_previous(column: str) -> tuple[np.ndarray, np.ndarray]:
+        """Values of column in the latest rows, and their previous rows."""
+
+        values = statistics_df[column].to_numpy(dtype=float, na_value=np.nan)
+        previous = values[next_index]
+        previous[~has_previous] = np.nan
+
+        return values[latest_index], previous
+    # End of latest_and_previous()
+
+    totals, previous_totals = latest_and_previous(statistic_required)
+    breakdowns = {name: latest_and_previous(column)
+                  for name, column in breakdown_fields.items()
+                  if column in statistics_df.columns}
+
+    dates = latest_df[date_field].tolist()
+    sources = (latest_df[source_field].tolist() if source_field is not None
+               else [None] * len(latest_df))
 
-            statistics[state] = {
-                "date": (date_total if isinstance(date_total, str)
-                         else date_total.strftime("%d/%m/%Y")),
-                "total": stats_total,
-                "today": stats_today,
-                "source": (None if source_field is None
-                           else state_df.iloc[first_index][source_field])
-            }
+    statistics = {}
 
-            # TODO: Investigate! date_total was str once, but that should not
-            # happen. The above is just a dirty fix.
+    for i, state in enumerate(latest_df["State"].tolist()):
+        stats_total = int(totals[i])
+
+        if np.isnan(previous_totals[i]):
+            stats_today = None
+        else:
+            stats_today = stats_total - int(previous_totals[i])
+
+        breakdown = {}
+        for name, (values, previous) in breakdowns.items():
+            total = None if np.isnan(values[i]) else int(values[i])
+            breakdown[name] = (
+                total,
+                None if total is None or np.isnan(previous[i])
+                else total - int(previous[i])
+            )
+
+        # TODO: Investigate! The date was a str once (i.e. the date column
+        # wasn't parsed), but that should not happen. The isinstance() check
+        # below is just a dirty fix.
+        statistics[state] = TimeseriesStat(
+            date=(dates[i] if isinstance(dates[i], str)
+                  else dates[i].strftime("%d/%m/%Y")),
+            total=stats_total,
+            today=stats_today,
+            source=None if pd.isnull(sources[i]) else str(sources[i]),
+            breakdown=breakdown or None
+        )
 
     return statistics
 # End of format_state_timeseries()
@@ -21,21 +21,36 @@
 
 
 # Import standard library dependencies
-from typing import TextIO, Union
+from typing import TextIO
 
 
-# Import helper function
+# Import helper function and record type
+from .records import TimeseriesStat
 from .timeseries_statewise import format_state_timeseries
 
 
+# Breakdowns of doses administered shown in detailed view, as name -> column
+VACCINATION_BREAKDOWN = {
+    "first_dose": "First Dose Administered",
+    "second_dose": "Second Dose Administered",
+    "male": "Male (Doses Administered)",
+    "female": "Female (Doses Administered)",
+    "transgender": "Transgender (Doses Administered)",
+    "covaxin": "Covaxin (Doses Administered)",
+    "covishield": "CoviShield (Doses Administered)",
+    "sputnik_v": "Sputnik V (Doses Administered)"
+}
+
+
 def format_vaccination_stats(
     vaccination_csv: TextIO
-) -> dict[str, dict[str, Union[int, str]]]:
-    """Make dicts for each state containing vaccination stats"""
+) -> dict[str, TimeseriesStat]:
+    """Make records for each state containing vaccination stats"""
 
     return format_state_timeseries(
         statistics_csv=vaccination_csv, date_field="Vaccinated As of",
-        statistic_required="Total Doses Administered"
+        statistic_required="Total Doses Administered",
+        breakdown_fields=VACCINATION_BREAKDOWN
     )
 # End of format_vaccine_stats()
 
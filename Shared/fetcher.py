@@ -0,0 +1,77 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+"""
+Standalone fetcher for sharded deployments. It fetches and parses the data
+whenever a feed is due (see Fetch/schedule.py) and publishes it for the shard
+processes, which should be
+run with COVID_SNAPSHOT_ROLE=reader.
+
+Run from the bot's root directory:
+    python -m Cogs.Utility.Covid.Shared.fetcher
+"""
+
+
+# Import standard library dependencies
+import asyncio
+import logging
+
+# Import helper functions
+from ..covid_stats_update import covid_stats_update, seconds_until_update
+
+
+# Used till the feed scheduler is made (i.e. when the first fetch fails)
+FETCH_INTERVAL = 15 * 60
+
+
+class Fetcher:
+    """Holds the data like the cog does, but without being a cog."""
+
+    covid_snapshot_role = "fetcher"
+# End of Fetcher class
+
+
+async def main() -> None:
+    fetcher = Fetcher()
+
+    while True:
+        try:
+            await covid_stats_update(fetcher)
+            logging.info("Published snapshot version %d",
+                         fetcher.covid_snapshot_version)
+        except Exception:  # Try again next time, like the cog's loop would
+            logging.exception("Failed to fetch data")
+
+        # Sleep till the next feed is due or midnight (or the usual interval
+        # on failure)
+        scheduler = getattr(fetcher, "covid_feed_scheduler", None)
+        await asyncio.sleep(FETCH_INTERVAL if scheduler is None
+                            else max(seconds_until_update(fetcher), 60))
+# End of main()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
+
+
+# End of file
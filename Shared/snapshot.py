@@ -0,0 +1,283 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from collections.abc import Mapping
+import mmap
+import os
+import struct
+import time
+from typing import Any, Iterator, Optional
+
+# Import helper functions
+from ..Format.json_decode import decode_json, encode_json
+from ..Format.records import (DistrictStats, Record, StateStats,
+                              TimeseriesStat)
+from ..Statistics.locations import build_location_index
+
+
+# When the bot is run as several shard processes, one of them (or a separate
+# process, see fetcher.py) can be the "fetcher", which fetches and parses the
+# data and publishes it to a file. The others are "reader"s, which map the
+# file read-only when a new version is published, and decode a location's
+# record only when it's looked up. So the data's pages are shared by all the
+# readers, and each of them keeps just the index of the file.
+# Not set (None) means every process fetches its own data, like before.
+SNAPSHOT_ROLE = os.environ.get("COVID_SNAPSHOT_ROLE")
+
+SNAPSHOT_PATH = os.environ.get("COVID_SNAPSHOT_PATH",
+                               "./Cogs/Utility/Covid/snapshot.bin")
+
+# Header: magic, version, time of publishing, length of the data (records
+# followed by their index), length of the index
+MAGIC = b"COVIDSN2"
+HEADER = struct.Struct("<8sQdQQ")
+
+# Stats dicts of the cog, whose records are looked up in the mapped file
+SNAPSHOT_ATTRIBUTES = (
+    "covid_state_stats",
+    "covid_district_stats",
+    "covid_test_stats",
+    "covid_vaccination_stats",
+)
+
+# Record classes, by the name stored along with their fields
+RECORD_TYPES = {
+    record_type.__name__: record_type
+    for record_type in (StateStats, DistrictStats, TimeseriesStat)
+}
+
+
+class SnapshotStats(Mapping):
+    """
+    Read-only dict of a published stats dict, backed by the mapped snapshot
+    file. Records are decoded on every lookup, and aren't kept.
+    """
+
+    __slots__ = ("_buffer", "_index")
+
+    def __init__(self, buffer: mmap.mmap, index: dict[str, int]) -> None:
+        self._buffer = buffer
+        self._index = index  # Location -> offset of its record in the file
+
+    def __getitem__(self, key: str) -> Any:
+        offset = self._index[key]
+        end = self._buffer.find(b"\n", offset)  # Records end with a newline
+        return decode_value(decode_json(self._buffer[offset:end]))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+# End of SnapshotStats class
+
+
+def encode_value(value: Any) -> Any:
+    """
+    Plain (json) form of a value of a stats dict: a record as its class name
+    followed by its fields, or a dict of such records.
+    """
+
+    if isinstance(value, Record):
+        return [type(value).__name__,
+                *(getattr(value, name) for name in value.__dataclass_fields__)]
+
+    return {key: encode_value(item) for key, item in value.items()}
+# End of encode_value()
+
+
+def decode_value(value: Any) -> Any:
+    """Make the record(s) back from what encode_value() returned."""
+
+    if isinstance(value, dict):
+        return {key: decode_value(item) for key, item in value.items()}
+
+    record = RECORD_TYPES[value[0]](*value[1:])
+
+    if isinstance(record, TimeseriesStat) and record.breakdown is not None:
+        record.breakdown = {name: tuple(numbers)
+                            for name, numbers in record.breakdown.items()}
+
+    return record
+# End of decode_value()
+
+
+def snapshot_role(self) -> Optional[str]:
+    """Role of this process: "fetcher", "reader" or None."""
+    return getattr(self, "covid_snapshot_role", SNAPSHOT_ROLE)
+# End of snapshot_role()
+
+
+def read_header(
+    path: str = SNAPSHOT_PATH
+) -> Optional[tuple[int, float, int, int]]:
+    """Get version, publish time, data and index length of the snapshot."""
+
+    try:
+        with open(path, "rb") as f:
+            magic, *header = HEADER.unpack(f.read(HEADER.size))
+    except (FileNotFoundError, struct.error):  # Not published yet
+        return None
+
+    return tuple(header) if magic == MAGIC else None
+# End of read_header()
+
+
+def encode_data(self) -> tuple[bytes, int]:
+    """
+    Encode the cog's data as the records (json lines) of every location one
+    after the other, followed by their index. Returns it along with the
+    index length.
+    """
+
+    records = bytearray()
+    index = {"covid_state_codes": self.covid_state_codes}
+
+    for name in SNAPSHOT_ATTRIBUTES:
+        offsets = index[name] = {}
+        for key, value in getattr(self, name).items():
+            offsets[key] = HEADER.size + len(records)
+            records += encode_json(encode_value(value)) + b"\n"
+
+    index = encode_json(index)
+    return bytes(records + index), len(index)
+# End of encode_data()
+
+
+def publish_snapshot(
+    self,
+    path: str = SNAPSHOT_PATH,
+    *,
+    data_changed: bool = True
+) -> int:
+    """
+    Write the cog's data to the snapshot file, and return its version. If
+    data hasn't changed since it was last published, only the schedule
+    (poll times) is written again, and the version stays the same.
+    """
+
+    header = read_header(path)
+    schedule = encode_json({
+        "covid_last_fetched": self.covid_last_fetched.isoformat(),
+        "covid_feed_next_refresh": self.covid_feed_next_refresh,
+    })
+
+    if (
+        not data_changed and header is not None
+        and header[:2] == getattr(self, "covid_snapshot_id", None)
+    ):
+        version, published, length, index_length = header
+        with open(path, "rb") as f:
+            data = f.read(HEADER.size + length)[HEADER.size:]
+    else:
+        data, index_length = encode_data(self)
+
+        # Continue from the version in the file, in case the fetcher
+        # restarted
+        version = max(getattr(self, "covid_snapshot_version", 0),
+                      header[0] if header is not None else 0) + 1
+        length, published = len(data), time.time()
+
+    # Write to another file and then replace, so that readers never see a
+    # partially written snapshot (and those which mapped the old file keep
+    # reading it as it was)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, published, length, index_length))
+        f.write(data)
+        f.write(schedule)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+    self.covid_snapshot_version = version
+    self.covid_snapshot_id = (version, published)
+    return version
+# End of publish_snapshot()
+
+
+def load_snapshot(self, path: str = SNAPSHOT_PATH) -> bool:
+    """
+    Map the snapshot file into the cog if a newer version has been published.
+    This is cheap to call often, since an unchanged file is found by just a
+    stat() call. Returns whether a new version was loaded (if just the
+    schedule was republished, only that is loaded, and False is returned).
+    """
+
+    # Import external dependency here, like the update does
+    import pendulum
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:  # Fetcher hasn't published anything yet
+        return False
+
+    file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if file_id == getattr(self, "covid_snapshot_file_id", None):
+        return False
+
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, published, length, index_length = (
+                HEADER.unpack_from(buffer)
+            )
+        except (ValueError, struct.error):  # Empty file, or not a snapshot
+            magic = None
+
+    if magic != MAGIC:
+        self.covid_snapshot_file_id = file_id
+        return False
+
+    data_end = HEADER.size + length
+    schedule = decode_json(buffer[data_end:])
+    self.covid_last_fetched = pendulum.parse(schedule["covid_last_fetched"])
+    self.covid_feed_next_refresh = schedule["covid_feed_next_refresh"]
+
+    # Version alone isn't enough to tell if it's the one already loaded,
+    # since a fetcher starting afresh (file deleted) starts from 1 again
+    if (version, published) == getattr(self, "covid_snapshot_id", None):
+        buffer.close()
+        self.covid_snapshot_file_id = file_id
+        return False
+
+    index = decode_json(buffer[data_end - index_length:data_end])
+    for name in SNAPSHOT_ATTRIBUTES:
+        setattr(self, name, SnapshotStats(buffer, index[name]))
+
+    # Set last, since corona() checks for it to know if data is available
+    self.covid_state_codes = index["covid_state_codes"]
+
+    build_location_index(self)
+
+    self.covid_snapshot_version = version
+    self.covid_snapshot_id = (version, published)
+    self.covid_snapshot_file_id = file_id
+    return True
+# End of load_snapshot()
+
+
+# End of file
@@ -21,17 +21,20 @@
 
 
 # Import standard library dependencies
-from typing import Optional, Union
+from typing import Optional
+
+# Import record type
+from ..Format.records import DistrictStats
 
 
 def get_district_stats(
     self,
     district: str,
     state: str = None
-) -> Optional[dict[str, Union[int, str]]]:
+) -> Optional[DistrictStats]:
 
-    if not state or state == "state":  # Empty str, or "state" which is a key
-        state = None            # in dict and is anyways not a valid state name
+    if not state:  # Empty str
+        state = None
 
     if district not in self.covid_district_stats:
         # Given string not a district
@@ -45,28 +48,29 @@ def get_district_stats(
         # No state given, i.e., state is None
         # Check if district exists in only one state, otherwise return
         # the stats for any arbitrary state
-        if "state" not in district_stats:
+        if not isinstance(district_stats, DistrictStats):
             district_stats = next(iter(district_stats.values()))
 
     else:  # State given
-        # There can be multiple dicts in district_stats
+        # There can be multiple records in district_stats
         # if a given district name can be found in two or more states.
         # For eg.: There is a district named Aurangabad in both
-        #          Maharashtra and Bihar, so there will be 2 dict values
+        #          Maharashtra and Bihar, so there will be 2 record values
         #          with keys being the respective state name
-        if state in district_stats:
+        if isinstance(district_stats, DistrictStats):  # Only in 1 state
+            if district_stats.state != state:
+                state = self.covid_state_codes.get(state.upper())
+                correct_state = district_stats.state == state
+
+        elif state in district_stats:
             district_stats = district_stats[state]
 
         elif (state_code := state.upper()) in self.covid_state_codes:
             state = self.covid_state_codes[state_code]
 
-            if state in district_stats:  # Multiple dicts in district_stats
+            if state in district_stats:  # Multiple records in district_stats
                 district_stats = district_stats[state]
 
-            elif "state" in district_stats:  # District X only in 1 state
-                if district_stats["state"] != state:
-                    correct_state = False
-
             else:  # Aurangabad, Uttarakhand does not exist
                 correct_state = False
 
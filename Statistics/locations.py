@@ -0,0 +1,93 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from bisect import bisect_left
+
+# Import record type
+from ..Format.records import DistrictStats
+
+
+# Discord doesn't allow more than 25 autocomplete choices
+MAX_SUGGESTIONS = 25
+
+
+def build_location_index(self) -> None:
+    """Make a sorted index of state names, codes and districts for lookup."""
+
+    entries = {}  # Lowercase key -> label suggested to the user
+
+    for state, state_data in self.covid_state_stats.items():
+        label = "India" if state == "Total" else state  # Same as corona()
+        entries[label.lower()] = label
+        entries[state_data.state_code.lower()] = label
+
+    for district, district_stats in self.covid_district_stats.items():
+        if isinstance(district_stats, DistrictStats):  # Unique across India
+            district_list = [district_stats]
+        else:  # Same district name in multiple states
+            district_list = district_stats.values()
+
+        for district_stat in district_list:
+            label = district + ", " + district_stat.state
+            entries[label.lower()] = label
+
+    # Keys and labels are kept in separate lists so that bisect can work
+    # directly on the keys (without making tuples for comparison)
+    keys = sorted(entries)
+    self.covid_location_keys = keys
+    self.covid_location_labels = [entries[key] for key in keys]
+# End of build_location_index()
+
+
+def search_locations(
+    self,
+    prefix: str,
+    limit: int = MAX_SUGGESTIONS
+) -> list[str]:
+    """Get up to limit locations whose name (or code) starts with prefix."""
+
+    if not hasattr(self, "covid_location_keys"):  # No data fetched yet
+        return []
+
+    keys = self.covid_location_keys
+    labels = self.covid_location_labels
+    prefix = prefix.strip().lower()
+
+    matches = []
+    index = bisect_left(keys, prefix)
+
+    while (
+        index < len(keys)
+        and len(matches) < limit
+        and keys[index].startswith(prefix)
+    ):
+        # A state can be reached by both its name and code, show it once
+        if (label := labels[index]) not in matches:
+            matches.append(label)
+        index += 1
+
+    return matches
+# End of search_locations()
+
+
+# End of file
@@ -0,0 +1,157 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import standard library dependencies
+from array import array
+import random
+import time
+
+
+# Size of the count-min sketch; memory is fixed at DEPTH * WIDTH doubles
+# (64 KiB here), however many different locations are queried
+WIDTH = 2048
+DEPTH = 4
+
+TOP_K = 32  # Locations whose (estimated) counts are kept
+HALF_LIFE = 24 * 60 * 60  # Seconds after which a query counts half
+
+# Counts are scaled up over time instead of decaying every counter; they are
+# brought back down once the scale gets this big
+RESCALE_AT = 2.0 ** 40
+
+PRIME = (1 << 61) - 1  # For hashing into the rows
+
+
+class LocationPopularity:
+    """
+    Track how often locations are queried, with older queries counting less
+    and less (halving every HALF_LIFE). A count-min sketch estimates the count
+    of any location, and a small top-K dict keeps the most queried ones.
+    """
+
+    def __init__(
+        self,
+        *,
+        width: int = WIDTH,
+        depth: int = DEPTH,
+        top_k: int = TOP_K,
+        half_life: float = HALF_LIFE
+    ) -> None:
+        self.width = width
+        self.top_k = top_k
+        self.half_life = half_life
+
+        rng = random.Random()
+        self._rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+        self._hashes = [(rng.randrange(1, PRIME), rng.randrange(PRIME))
+                        for _ in range(depth)]
+
+        # Forward decay: a query at time t adds 2 ** ((t - start) / half life)
+        self._start = time.monotonic()
+
+        self._top: dict[str, float] = {}  # Location -> scaled count
+        self._top_min = 0.0  # Smallest count in _top (when it's full)
+
+    def add(self, location: str) -> None:
+        """Count a query for location."""
+
+        weight = 2.0 ** ((time.monotonic() - self._start) / self.half_life)
+        if weight > RESCALE_AT:
+            self._rescale()
+            weight = 1.0
+
+        key = hash(location)
+        width = self.width
+        estimate = None
+
+        for row, (a, b) in zip(self._rows, self._hashes):
+            index = (a * key + b) % PRIME % width
+            row[index] += weight
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+
+        top = self._top
+        if location in top or len(top) < self.top_k:
+            top[location] = estimate
+            if len(top) == self.top_k:
+                self._top_min = min(top.values())
+        elif estimate > self._top_min:  # Replace the least queried one
+            del top[min(top, key=top.get)]
+            top[location] = estimate
+            self._top_min = min(top.values())
+
+    def _rescale(self) -> None:
+        """Bring the counts down to the current time's scale."""
+
+        now = time.monotonic()
+        scale = 2.0 ** ((now - self._start) / self.half_life)
+
+        for row in self._rows:
+            for index in range(len(row)):
+                row[index] /= scale
+
+        self._top = {location: count / scale
+                     for location, count in self._top.items()}
+        self._top_min /= scale
+        self._start = now
+
+    def _decayed(self, count: float) -> float:
+        """Scaled count -> count as of now, with decay applied."""
+        return count / 2.0 ** ((time.monotonic() - self._start)
+                               / self.half_life)
+
+    def estimate(self, location: str) -> float:
+        """Estimated (decayed) number of queries for a location."""
+
+        key = hash(location)
+        return self._decayed(min(
+            row[(a * key + b) % PRIME % self.width]
+            for row, (a, b) in zip(self._rows, self._hashes)
+        ))
+
+    def top(self, count: int = 10) -> list[tuple[str, float]]:
+        """Most queried locations, with their (decayed) number of queries."""
+
+        hottest = sorted(self._top.items(), key=lambda item: item[1],
+                         reverse=True)[:count]
+        return [(location, self._decayed(scaled))
+                for location, scaled in hottest]
+# End of LocationPopularity class
+
+
+def get_popularity(self) -> LocationPopularity:
+    """Get the location popularity tracker of the cog, making it if needed."""
+
+    if not hasattr(self, "covid_popularity"):
+        self.covid_popularity = LocationPopularity()
+
+    return self.covid_popularity
+# End of get_popularity()
+
+
+def hot_locations(self, count: int = 10) -> list[str]:
+    """Most queried locations lately, for caching and warm-up decisions."""
+    return [location for location, _ in get_popularity(self).top(count)]
+# End of hot_locations()
+
+
+# End of file
@@ -21,10 +21,13 @@
 
 
 # Import standard library dependencies
-from typing import Optional, Union
+from typing import Optional
 
+# Import record type
+from ..Format.records import StateStats
 
-def get_state_stats(self, state: str) -> Optional[dict[str, Union[int, str]]]:
+
+def get_state_stats(self, state: str) -> Optional[StateStats]:
 
     if state in self.covid_state_stats:
         return self.covid_state_stats[state]
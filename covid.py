@@ -22,9 +22,7 @@
 
 # Import standard library dependencies
 from inspect import cleandoc
-
-# Import external dependencies
-import pendulum
+import time
 
 # Import discord.py stuff
 from discord.ext import commands
@@ -35,6 +33,11 @@ from Factory.numbers import format_number  # Just adds commas and sign here.
 
 # Import helper functions
 from .covid_stats_update import covid_stats_update
+from .Diagnostics.memory import memory_report
+from .Dispatch.coalesce import get_coalescer
+from .Fetch.schedule import minutes_until_refresh
+from .Shared.snapshot import load_snapshot, snapshot_role
+from .Statistics.popularity import get_popularity
 from .Statistics.state import get_state_stats
 from .Statistics.district import get_district_stats
 
@@ -57,11 +60,17 @@ Examples:
 @@covid Gurugram --> Would send statistics for Gurugram, Haryana.
 @@covid Aurangabad, br --> Would send statistics for Aurangabad, Bihar.
 @@covid aurangabad, mh --> Would send statistics for Maharashtra one.
+```
+```
+@@covid Odisha --vaccination --> Would also break down doses administered \
+in Odisha by dose, gender and vaccine.
 ``` \
 
-Bot fetches data every 15 minutes from API provided by covid19india.org.
+Bot fetches data from API provided by covid19india.org, checking each data \
+source more often around the times it usually gets updated.
 
-To prevent spam, there's a cooldown period of 5 seconds for users.
+To prevent spam, there's a cooldown period of 5 seconds for users, and same \
+queries made together in a channel are answered with a single message.
 """)
 
 
@@ -80,11 +89,24 @@ async def corona(
     *, location: str = "Total"
 ) -> None:
 
+    # Pick up data published by the fetcher process (only a stat() call if
+    # nothing new has been published)
+    if snapshot_role(self) == "reader":
+        load_snapshot(self)
+
     # Check if we have data (See last variable set in update loop)
     if not hasattr(self, "covid_state_codes"):
-        fail = "Try again after some time.\nFetching data..."
+        if snapshot_role(self) == "reader":  # Nothing to fetch here
+            fail = ("Try again after some time.\nData hasn't been "
+                    "published by the fetcher process yet.")
+        else:
+            fail = "Try again after some time.\nFetching data..."
         await ctx.send(embed=create_embed(ctx, error=True, description=fail))
-        self.corona_stats_update.start()  # Starts corona_stats_update() loop
+
+        # Starts corona_stats_update() loop (if the first fetch isn't
+        # already going on)
+        if not self.corona_stats_update.is_running():
+            self.corona_stats_update.start()
         return
 
     # Allow owner to force update
@@ -94,9 +116,52 @@ async def corona(
         await ctx.send("Fetched.")
         return
 
+    # Allow owner to see how well replies are being coalesced
+    if self.bot.owner_id == ctx.author.id and location == "--coalesce-stats":
+        metrics = get_coalescer(self).metrics()
+        await ctx.send("\n".join(f"{k}: {v}" for k, v in metrics.items()))
+        return
+
+    # Allow owner to see the most queried locations lately
+    if self.bot.owner_id == ctx.author.id and location == "--hot-locations":
+        hot = get_popularity(self).top(15)
+        await ctx.send("\n".join(f"{place}: ~{count:.1f} queries"
+                                 for place, count in hot) or "No queries yet.")
+        return
+
+    # Allow owner to see how much memory the data and refreshes take
+    if self.bot.owner_id == ctx.author.id and location == "--memory":
+        await ctx.send("```\n" + memory_report(self) + "\n```")
+        return
+
+    # Allow owner to see how often each feed is being polled
+    if (
+        self.bot.owner_id == ctx.author.id and location == "--schedule"
+        and hasattr(self, "covid_feed_scheduler")  # Not in shard processes
+    ):
+        summary = self.covid_feed_scheduler.summary()
+        await ctx.send("\n".join(
+            f"{feed}: " + ", ".join(f"{k} {v:g}" for k, v in stats.items())
+            for feed, stats in summary.items()
+        ))
+        return
+
+    # Vaccination breakdown is shown if asked, like "@@covid tn --vaccination"
+    detailed = location.lower().endswith("--vaccination")
+    if detailed:
+        location = location[:-len("--vaccination")].strip() or "Total"
+
     # If the fetch task failed/stopped, we need to start it back
-    # We can determine it stopped, if it didn't update after 15 minutes
-    if pendulum.now().subtract(minutes=15) > self.covid_last_fetched:
+    # We can determine it stopped, if it didn't update even 15 minutes after
+    # the next fetch was due
+    stale_note = ""
+    stale = time.time() - 15 * 60 > min(self.covid_feed_next_refresh.values())
+
+    if stale and snapshot_role(self) == "reader":
+        # Fetching is up to the fetcher process, so just warn about it
+        stale_note = ("⚠ New data hasn't been published for a while, so "
+                      "these statistics may be out of date.\n\n")
+    elif stale:
         msg = await ctx.send("Seems like I had problems fetching data. "
                              "Fetching again...\nIf this problem "
                              "persists, please report in the meta server.")
@@ -142,7 +207,7 @@ async def corona(
 
         if stats is not None:
             # Get data related to the state of district
-            state_stats = get_state_stats(self, stats["state"])
+            state_stats = get_state_stats(self, stats.state)
         else:
             fail = (f"District `{location}` doesn't exist! Make sure to:\n"
                     "- Specify full name of the district,\n"
@@ -160,7 +225,7 @@ async def corona(
 
             if stats is not None:
                 # Get data related to the state of district
-                state_stats = get_state_stats(self, stats["state"])
+                state_stats = get_state_stats(self, stats.state)
                 district = True
             else:
                 # No state or district found for the given query
@@ -177,138 +242,197 @@ async def corona(
 
     # Now, make the embed to send data
 
-    title = "COVID-19 statistics for "
     if district:
-        title += stats["district"] + ", " + stats["state"]
-    elif stats["state"] == "Total":
-        title += "India"
+        place = stats.district + ", " + stats.state
+    elif stats.state == "Total":
+        place = "India"
     else:
-        title += stats["state"]
+        place = stats.state
 
-    description = cleandoc("""
-        • Follow the precautions strictly & cooperate with authorities.
-        • Strive to encourage vaccination irrespective of brand.
-        • Refrain from spreading panic and misinformation.
-        \u200b
-    """)  # Used \u200b to add newline in end
+    title = "COVID-19 statistics for " + place
 
-    last_fetched = ("⦿ Last fetched from API "
-                    f"{ self.covid_last_fetched.diff_for_humans() }.")
-    # Difference between now and covid_last_updated time with "ago" text
+    # Count the query (even if coalesced), to know which locations are hot
+    get_popularity(self).add(place)
 
-    data = create_embed(ctx, title=title, description=description,
-                        footer=f"+{last_fetched}",
-                        thumbnail=self.get_asset_url("yellow_biohazard.png"))
-
-    # Now, add embed fields corresponding to the data
-
-    rec_val = format_number(stats["recovered"])
-    data.add_field(name="**😊 Recovered**", value=rec_val)
+    # Identical queries in this channel get answered by a single message, so
+    # only the first one needs to make the embed
+    coalescer = get_coalescer(self)
+    if not coalescer.claim(ctx, (title, detailed)):
+        return
 
-    deaths_val = format_number(stats["deaths"])
-    data.add_field(name="**🇫 Deceased**", value=deaths_val)
+    # If making the reply fails, those who asked the same along with ctx get
+    # an error, and identical queries made later shouldn't wait on it
+    try:
+        description = cleandoc("""
+            • Follow the precautions strictly & cooperate with authorities.
+            • Strive to encourage vaccination irrespective of brand.
+            • Refrain from spreading panic and misinformation.
+            \u200b
+        """)  # Used \u200b to add newline in end
+        description = stale_note + description
 
-    daily_inf_val = format_number(stats["new_cases"])
-    data.add_field(name="**📊 Infected today**", value=daily_inf_val)
+        last_fetched = ("⦿ Last fetched from API "
+                        f"{ self.covid_last_fetched.diff_for_humans() }.")
+        # Difference between now and covid_last_updated time with "ago" text
 
-    daily_rcv_val = format_number(stats["new_recoveries"])
-    data.add_field(name="**📊 Cured today**", value=daily_rcv_val)
+        data = create_embed(ctx, title=title, description=description,
+                            footer=f"+{last_fetched}",
+                            thumbnail=self.get_asset_url(
+                                "yellow_biohazard.png"
+                            ))
 
-    daily_deaths_val = format_number(stats["new_deaths"])
-    data.add_field(name="**📊 Departed today**", value=daily_deaths_val)
+        # Now, add embed fields corresponding to the data
 
-    # Add active cases stats at start, with increase in parentheses
-    if district:
-        up = stats["new_active"]
-    else:
-        up = (int(stats["new_cases"]) - int(stats["new_recoveries"])
-              - int(stats["new_deaths"]))
-    active_cases = format_number(stats["active"])
-    active_cases += " (" + format_number(up, sign_req=True) + ")"
-    data.insert_field_at(0, name="**🤒 Active cases**", value=active_cases)
+        rec_val = format_number(stats.recovered)
+        data.add_field(name="**😊 Recovered**", value=rec_val)
 
-    # Helper function
+        deaths_val = format_number(stats.deaths)
+        data.add_field(name="**🇫 Deceased**", value=deaths_val)
 
-    def no_data_available(data: str) -> str:
-        """Use if no data available for testing, vaccination, etc."""
+        daily_inf_val = format_number(stats.new_cases)
+        data.add_field(name="**📊 Infected today**", value=daily_inf_val)
 
-        no_data = f"No {data} data currently available for this state/UT. "
-        no_data += "Try again after "
+        daily_rcv_val = format_number(stats.new_recoveries)
+        data.add_field(name="**📊 Cured today**", value=daily_rcv_val)
 
-        when_upd = self.covid_last_fetched.diff_for_humans().split(" ")[0]
+        daily_deaths_val = format_number(stats.new_deaths)
+        data.add_field(name="**📊 Departed today**", value=daily_deaths_val)
 
-        if "minute" in self.covid_last_fetched.diff_for_humans():
-            when_upd = 15 - int(when_upd)
-        else:  # Takes care of the "a few seconds ago" case
-            when_upd = 15
+        # Add active cases stats at start, with increase in parentheses
+        if district:
+            up = stats.new_active
+        else:
+            up = stats.new_cases - stats.new_recoveries - stats.new_deaths
+        active_cases = format_number(stats.active)
+        active_cases += " (" + format_number(up, sign_req=True) + ")"
+        data.insert_field_at(0, name="**🤒 Active cases**", value=active_cases)
 
-        no_data += f"{when_upd} minutes when data will be fetched again."
+        # Helper function
 
-        return no_data
-    # End of no_data_available()
+        def no_data_available(data: str, feeds: tuple[str, ...]) -> str:
+            """Use if no data available for testing, vaccination, etc."""
 
-    state = state_stats["state"]
+            no_data = f"No {data} data currently available for this state/UT. "
+            no_data += "Try again after "
 
-    # Add state's testing data
+            # When any of the feeds having this data will be fetched next
+            when_upd = minutes_until_refresh(self, feeds)
 
-    if state not in self.covid_test_stats:
-        tests_val = no_data_available("testing")
-    else:
-        tests = self.covid_test_stats[state]
-        tests_val = format_number(tests["total"]) + " "
+            no_data += (f"{when_upd} minute{'s' if when_upd > 1 else ''} when "
+                        "data will be fetched again.")
 
-        if increase := tests["today"]:  # Not an empty string
-            tests_val += "(" + format_number(increase, sign_req=True) + ") "
+            return no_data
+        # End of no_data_available()
 
-        tests_val += f"[[up to {tests['date']}]({tests['source']})]"
+        state = state_stats.state
 
-    if state == "Total":
-        tests_place = "**🧪 Samples tested nationally**"
-    elif state == "State Unassigned":
-        tests_place = "**🧪 Samples tested not assigned to any state**"
-    else:
-        tests_place = f"**🧪 Samples tested in {state}**"
+        # Add state's testing data
 
-    data.add_field(name=tests_place, value=tests_val, inline=False)
+        if state not in self.covid_test_stats:
+            tests_val = no_data_available("testing", ("tests", "icmr"))
+        else:
+            tests = self.covid_test_stats[state]
+            tests_val = format_number(tests.total) + " "
 
-    # Get the vaccine doses administered
-    vaccine_val = ""
+            if increase := tests.today:  # Known, and not 0
+                tests_val += ("(" + format_number(increase, sign_req=True)
+                              + ") ")
 
-    if state not in self.covid_vaccination_stats:
-        vaccination_stats = no_data_available("vaccination")
-    else:
-        vaccination_stats = self.covid_vaccination_stats[state]
-        vaccine_val = format_number(vaccination_stats["total"]) + " "
+            tests_val += f"[[up to {tests.date}]({tests.source})]"
 
-        if increase := vaccination_stats["today"]:
-            vaccine_val += "(" + format_number(increase, sign_req=True) + ") "
+        if state == "Total":
+            tests_place = "**🧪 Samples tested nationally**"
+        elif state == "State Unassigned":
+            tests_place = "**🧪 Samples tested not assigned to any state**"
+        else:
+            tests_place = f"**🧪 Samples tested in {state}**"
 
-        vaccine_val += f"[up to {vaccination_stats['date']}]"
+        data.add_field(name=tests_place, value=tests_val, inline=False)
 
-    if state == "Total":
-        vaccine_location = "nationally"
-    elif state == "State Unassigned":
-        vaccine_location = "not assigned to any state"
-    else:
-        vaccine_location = "in " + state
+        # Get the vaccine doses administered
+        vaccine_val = ""
 
-    vaccine_name = f"**💉 Vaccine doses administered {vaccine_location}**"
-    data.add_field(name=vaccine_name, value=vaccine_val, inline=False)
-
-    total_cases = format_number(stats["confirmed"])
-    data.add_field(name="**😷 Total cases**", value=total_cases)
+        if state not in self.covid_vaccination_stats:
+            vaccination_stats = no_data_available("vaccination",
+                                                  ("vaccination",))
+        else:
+            vaccination_stats = self.covid_vaccination_stats[state]
+            vaccine_val = format_number(vaccination_stats.total) + " "
 
-    if stats["notes"]:  # Add notes at the start
-        data.insert_field_at(0, name=f"**📝 Notes (for {location})**",
-                             value=stats["notes"], inline=False)
+            if increase := vaccination_stats.today:
+                vaccine_val += ("(" + format_number(increase, sign_req=True)
+                                + ") ")
 
-    last_updated = "**⌛ Last updated "
-    if state != "Total":
-        last_updated += "(for " + state_stats["state_code"] + ") "
-    last_updated += "on**"
-    data.add_field(name=last_updated, value=state_stats["last_updated"])
+            vaccine_val += f"[up to {vaccination_stats.date}]"
 
-    await ctx.send(embed=data)
+        if state == "Total":
+            vaccine_location = "nationally"
+        elif state == "State Unassigned":
+            vaccine_location = "not assigned to any state"
+        else:
+            vaccine_location = "in " + state
+
+        vaccine_name = f"**💉 Vaccine doses administered {vaccine_location}**"
+        data.add_field(name=vaccine_name, value=vaccine_val, inline=False)
+
+        if (
+            detailed and state in self.covid_vaccination_stats
+            and vaccination_stats.breakdown
+        ):
+            breakdown = vaccination_stats.breakdown
+
+            def breakdown_line(heading: str, labels: dict[str, str]) -> str:
+                """Make a line of breakdowns, like doses by gender."""
+
+                values = []
+                for name, label in labels.items():
+                    total, increase = breakdown.get(name, (None, None))
+                    if total is None:
+                        continue
+
+                    value = f"{label}: {format_number(total)}"
+                    if increase:
+                        value += f" ({format_number(increase, sign_req=True)})"
+                    values.append(value)
+
+                return f"**{heading}** " + ", ".join(values) if values else ""
+            # End of breakdown_line()
+
+            breakdown_val = "\n".join(line for line in (
+                breakdown_line("Dose", {"first_dose": "1st",
+                                        "second_dose": "2nd"}),
+                breakdown_line("Gender", {"male": "Male", "female": "Female",
+                                          "transgender": "Transgender"}),
+                breakdown_line("Vaccine", {"covaxin": "Covaxin",
+                                           "covishield": "Covishield",
+                                           "sputnik_v": "Sputnik V"}),
+            ) if line)
+
+            if breakdown_val:
+                data.add_field(name="**💉 Doses administered by**",
+                               value=breakdown_val, inline=False)
+
+        total_cases = format_number(stats.confirmed)
+        data.add_field(name="**😷 Total cases**", value=total_cases)
+
+        if stats.notes:  # Add notes at the start
+            data.insert_field_at(0, name=f"**📝 Notes (for {location})**",
+                                 value=stats.notes, inline=False)
+
+        last_updated = "**⌛ Last updated "
+        if state != "Total":
+            last_updated += "(for " + state_stats.state_code + ") "
+        last_updated += "on**"
+        data.add_field(name=last_updated, value=state_stats.last_updated)
+    except BaseException:
+        fail = "Try again after some time.\nCouldn't make the reply."
+        await coalescer.abandon(
+            ctx, (title, detailed),
+            create_embed(ctx, error=True, description=fail)
+        )
+        raise
+
+    await coalescer.release(ctx, (title, detailed), data)
 # End of corona()
 
 
@@ -0,0 +1,80 @@
+###############################################################################
+
+# Copyright (C) 2022  Gouenji Shuuya
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The online repository may be found at <https://github.com/aaptaha/old-covid>.
+
+###############################################################################
+
+
+# Import discord.py stuff
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+# Import the prefix command, whose callback does the actual work
+from .covid import corona
+
+# Import helper functions
+from .Statistics.locations import search_locations
+
+
+class CovidSlashCommands:
+    """
+    Slash command variant of `@@covid`, with autocomplete for locations.
+    Mix this into the cog class, since discord.py needs app command callbacks
+    (taking self) to be defined inside a class.
+    """
+
+    # Command decorators
+    @app_commands.command(
+        name="covid",
+        description="Get COVID-19 statistics for India"
+    )
+    @app_commands.describe(
+        location="State/UT name or code, or district as \"District, State\""
+    )
+    @app_commands.checks.cooldown(1, 5, key=lambda i: (i.guild_id, i.user.id))
+    @app_commands.guild_only()
+    # Command definition starts
+    async def corona_slash(
+        self, interaction: discord.Interaction,
+        location: str = "Total"
+    ) -> None:
+        # Fetching and the coalescer can take longer than the 3 seconds
+        # Discord gives for the initial response
+        await interaction.response.defer()
+
+        ctx = await commands.Context.from_interaction(interaction)
+        await corona.callback(self, ctx, location=location)
+    # End of corona_slash()
+
+    @corona_slash.autocomplete("location")
+    async def covid_location_autocomplete(
+        self, interaction: discord.Interaction,
+        current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest states/UTs and districts starting with what's typed."""
+
+        return [
+            app_commands.Choice(name=label, value=label)
+            for label in search_locations(self, current)
+        ]
+    # End of covid_location_autocomplete()
+# End of CovidSlashCommands class
+
+
+# End of file
@@ -21,82 +21,243 @@
 
 
 # Import standard library dependencies
+from datetime import date, datetime, timedelta
 from io import StringIO
-
-# Import external dependencies
-import aiohttp
-import pendulum
+import time
 
 # Import helper/formatter functions
 from .Format.state import format_state_stats
-from .Format.district import format_district_stats
+from .Format.district import (format_district_json_stats,
+                              format_district_stats)
+from .Format.json_decode import (decode_data_json, extract_district_json,
+                                 extract_state_json)
 from .Format.tests import format_test_stats
 from .Format.vaccination import format_vaccination_stats
+from .Diagnostics.memory import get_memory_monitor
+from .Fetch.http import fetch_feeds, get_http_session
+from .Fetch.recorder import record_feeds
+from .Export.server import refresh_export
+from .Fetch.schedule import DUE_SLACK, get_feed_scheduler
+from .Shared.snapshot import load_snapshot, publish_snapshot, snapshot_role
+from .Statistics.locations import build_location_index
+
+
+# URLs for getting data
+API_HOST = "https://data.covid19india.org"
+FEED_PATHS = {
+    "state": "/csv/latest/state_wise.csv",
+    # state_wise.csv has not been updated for a week, so use json
+    "state_json": "/v4/min/data.min.json",
+    "district": "/csv/latest/district_wise.csv",
+    "tests": "/csv/latest/statewise_tested_numbers_data.csv",
+    "icmr": "/csv/latest/tested_numbers_icmr_data.csv",
+    "vaccination": "/csv/latest/vaccine_doses_statewise_v2.csv",
+}
+
+# Take district data from data.min.json (which is anyways fetched for states)
+# instead of downloading district_wise.csv separately
+DISTRICTS_FROM_JSON = False
+
+# Feeds formatted together. Bodies aren't kept between refreshes, so when
+# one of them changes, the others are fetched again along with it.
+FEED_GROUPS = (("state", "state_json"), ("tests", "icmr"))
 
 
 async def covid_stats_update(self, *, restart_loop: bool = False) -> None:
     """Fetches latest data from covid19india.org API."""
 
-    # URLs for getting data
-    host = "https://data.covid19india.org/csv/latest/"
-    state_url = host + "state_wise.csv"
-    district_url = host + "district_wise.csv"
-    tests_url = host + "statewise_tested_numbers_data.csv"
-    icmr_url = host + "tested_numbers_icmr_data.csv"
-    vaccination_url = host + "vaccine_doses_statewise_v2.csv"
+    # Shard processes only load what the fetcher process has published
+    if snapshot_role(self) == "reader":
+        load_snapshot(self)
+        restart_stats_update(self, restart_loop)
+        return
 
-    # state_wise.csv has not been updated for a week, so use json
-    state_json_url = "https://data.covid19india.org/v4/min/data.min.json"
+    # Import external dependency here rather than at the top, so that
+    # loading the cog stays quick (it's needed only from first refresh)
+    import pendulum
 
-    # Now fetch the data
-    async with aiohttp.ClientSession() as session:
-        # Get state-wise and national case data
-        async with session.get(state_url) as resp:
-            state_csv = StringIO(await resp.text())
+    # Measure the memory used by refreshes (see @@covid --memory)
+    memory = get_memory_monitor(self)
+    memory.refresh_started()
 
-        async with session.get(state_json_url) as resp:
-            state_json = await resp.json()
+    host = getattr(self, "covid_api_host", API_HOST)  # Changed in benchmarks
+    feeds = {name: path for name, path in FEED_PATHS.items()
+             if not (name == "district" and DISTRICTS_FROM_JSON)}
 
-        # Get district-wise data
-        async with session.get(district_url) as resp:
-            district_csv = StringIO(await resp.text())
+    # Poll only the feeds which are due as per their publish patterns (all
+    # of them if forced, or if there's no data yet). The loop can wake up a
+    # little before the feed is due, so feeds due within DUE_SLACK are
+    # polled as well.
+    started = time.time()
+    scheduler = get_feed_scheduler(self, feeds)
+    forced = restart_loop or not hasattr(self, "covid_state_codes")
+    due = list(feeds) if forced else scheduler.due(started + DUE_SLACK)
 
-        # Get testing data for all states
-        async with session.get(tests_url) as resp:
-            tests_csv = StringIO(await resp.text())
+    # Now fetch all the due data together, using the session kept by the cog
+    session = get_http_session(self)
+    fetched = await fetch_feeds(session, {name: host + feeds[name]
+                                          for name in due})
 
-        # Get national (India's) testing data from ICMR csv
-        async with session.get(icmr_url) as resp:
-            icmr_csv = StringIO(await resp.text())
+    changed = {name for name, body in fetched.items()
+               if scheduler.observe(name, body)}
 
-        # Get data on vaccine doses administered in a state
-        async with session.get(vaccination_url) as resp:
-            vaccination_csv = StringIO(await resp.text())
+    # Whether the state json's deltas are shown depends on today's date, so
+    # format it again once the date has changed since it was last formatted
+    if getattr(self, "covid_formatted_on", None) != date.today():
+        changed.add("state_json")
+
+    if forced:  # Format everything again
+        changed = set(feeds)
 
-    # Format and store the data
-    self.covid_state_stats = await format_state_stats(state_csv, state_json)
-    self.covid_district_stats = await format_district_stats(district_csv)
-    self.covid_test_stats = format_test_stats(tests_csv, icmr_csv)
-    self.covid_vaccination_stats = format_vaccination_stats(vaccination_csv)
+    # Fetch the feeds formatted along with the changed ones, if they weren't
+    # due (their bodies from earlier polls aren't kept)
+    dependents = [name for group in FEED_GROUPS if changed.intersection(group)
+                  for name in group if name not in fetched]
+    if dependents:
+        fetched.update(await fetch_feeds(
+            session, {name: host + feeds[name] for name in dependents}
+        ))
+        changed.update(name for name in dependents
+                       if scheduler.observe(name, fetched[name]))
 
-    # Make state code -> state mapping
-    self.covid_state_codes = {}
-    for state, state_data in self.covid_state_stats.items():
-        state_code = state_data["state_code"]
-        self.covid_state_codes[state_code] = state
+    # Archive what was fetched, for replaying it later (if enabled)
+    await record_feeds(self, fetched)
 
-    # Set the time of last fetch
-    self.covid_last_fetched = pendulum.now()
+    # Format and store the data, for the feeds which have changed
+    try:
+        await format_feeds(self, fetched, changed)
+    except BaseException:
+        # Have them count as changed at their next poll, so that they are
+        # formatted again even if upstream doesn't change them by then
+        scheduler.forget(changed)
+        raise
+    finally:
+        del fetched
+
+    # When each feed will be polled next (used to tell users when to retry)
+    self.covid_feed_next_refresh = {
+        name: scheduler.feeds[name].next_due for name in feeds
+    }
+
+    if changed:
+        # Make state code -> state mapping
+        self.covid_state_codes = {}
+        for state, state_data in self.covid_state_stats.items():
+            state_code = state_data.state_code
+            self.covid_state_codes[state_code] = state
+
+        # Rebuild the index used for autocompleting locations
+        build_location_index(self)
+
+    polled = bool(due or changed)  # Feeds are fetched only for these
+    if polled:  # Set the time of last fetch
+        self.covid_last_fetched = pendulum.now()
+
+    memory.refresh_finished()
+
+    # Share it with the shards (just the poll times if no data changed)
+    if snapshot_role(self) == "fetcher" and polled:
+        publish_snapshot(self, data_changed=bool(changed))
+
+    if changed:  # Serve the new data to other services (if enabled)
+        await refresh_export(self)
+
+    # Wake up the update loop when the next feed is due, or at midnight (the
+    # fetcher process doesn't have the loop). The loop counts the interval
+    # from when this iteration started, not from now.
+    if hasattr(self, "corona_stats_update"):
+        self.corona_stats_update.change_interval(
+            seconds=max(seconds_until_update(self, now=started), 60)
+        )
 
-    # Restart the update task loop of the cog if requested
     # This is put at the end instead of start so that data is at least fetched
     # once when called.
+    restart_stats_update(self, restart_loop)
+# End of covid_stats_update()
+
+
+async def format_feeds(
+    self,
+    bodies: dict[str, bytes],
+    changed: set[str]
+) -> None:
+    """
+    Format and store the data of the feeds which have changed. bodies should
+    have all the feeds of a group (see FEED_GROUPS) if any of them changed.
+    """
+
+    if changed & {"state", "state_json"}:
+        formatted_on = date.today()  # Before formatting, in case it changes
+        # Get state-wise and national case data
+        state_csv = StringIO(bodies["state"].decode())
+
+        # Only totals, deltas and meta are needed, so the rest of the (big)
+        # json is dropped while decoding it
+        data_json = decode_data_json(bodies["state_json"],
+                                     districts=DISTRICTS_FROM_JSON)
+        state_json = extract_state_json(data_json)
+        district_json = (extract_district_json(data_json)
+                         if DISTRICTS_FROM_JSON else None)
+        del data_json
+
+        self.covid_state_stats = await format_state_stats(state_csv,
+                                                          state_json)
+
+        if DISTRICTS_FROM_JSON:
+            state_codes = {
+                state_data.state_code: state
+                for state, state_data in self.covid_state_stats.items()
+            }
+            self.covid_district_stats = await format_district_json_stats(
+                district_json, state_json, state_codes
+            )
+
+        self.covid_formatted_on = formatted_on
+
+    if "district" in changed:  # Get district-wise data
+        district_csv = StringIO(bodies["district"].decode())
+        self.covid_district_stats = await format_district_stats(district_csv)
+
+    if changed & {"tests", "icmr"}:
+        # Get testing data for all states, and national (India's) testing
+        # data from ICMR csv
+        tests_csv = StringIO(bodies["tests"].decode())
+        icmr_csv = StringIO(bodies["icmr"].decode())
+        self.covid_test_stats = format_test_stats(tests_csv, icmr_csv)
+
+    if "vaccination" in changed:
+        # Get data on vaccine doses administered in a state
+        vaccination_csv = StringIO(bodies["vaccination"].decode())
+        self.covid_vaccination_stats = format_vaccination_stats(
+            vaccination_csv
+        )
+# End of format_feeds()
+
+
+def seconds_until_update(self, now: float = None) -> float:
+    """
+    Seconds till the next feed is due, or till the next (local) midnight,
+    when the state data has to be formatted again for the new date.
+    """
+
+    now = time.time() if now is None else now
+    tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+    midnight = datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    return min(self.covid_feed_scheduler.seconds_until(now=now),
+               midnight - now)
+# End of seconds_until_update()
+
+
+def restart_stats_update(self, restart_loop: bool) -> None:
+    """Restart the update task loop of the cog if requested."""
+
     if restart_loop:
         if self.corona_stats_update.is_running():
             self.corona_stats_update.restart()
         else:
             self.corona_stats_update.start()
-# End of covid_stats_update()
+# End of restart_stats_update()
 
 
 # End of file